@@ -0,0 +1,279 @@
+"""无界面的批量求解命令行工具
+
+从文件或标准输入流式读取谜题，用进程池并行求解，结果以 JSON Lines 写到标准输出，统计信息写到标准错误。
+不导入 pygame，工作进程只需加载 NumPy 和求解核心。
+
+输入每行一个谜题，支持两种格式：
+- JSON：{"id": "p1", "board": [[0, 3, ...], ...] 或 "0300...", "pieces": {"Q": 1, "R": 2}}
+- 紧凑文本：64个字符的棋盘（. 或 0 表示空格，1-3 为骷髅生命值，可用 / 分隔各行）后跟棋子数量，例如
+  "...3..../......../..1..2../......../....1.../.2....../......../.......1 Q1R2N3"
+格式错误的行在结果中记为出错，错误信息带有所在的输入文件和行号。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from bomb_solver import (
+    PIECE_TYPES,
+    PortfolioSolver,
+    SearchStats,
+    SolveResult,
+    batched_beam_search_solution,
+    beam_search_solution,
+    exact_search_solution,
+    iterative_widening_solution,
+    mcts_solution,
+    polished_beam_solution,
+    profile_solver,
+)
+
+SOLVER_MODES = ("exact", "beam", "batched", "widening", "lns", "mcts", "portfolio")
+
+
+BOARD_CELLS = ".0123"  # 紧凑文本棋盘允许的字符
+CELL_RANGE = (-1, 3)  # 列表形式棋盘允许的取值：-1 为已放置的棋子，0 为空格，1-3 为骷髅生命值
+
+
+def parse_board(value):
+    """把列表或字符串形式的棋盘转换为 8x8 数组，格子取值超出范围时抛出 ValueError"""
+    if isinstance(value, str):
+        cells = value.replace("/", "")
+        if len(cells) != 64:
+            raise ValueError(f"棋盘必须是64个字符，实际为 {len(cells)} 个: {value!r}")
+        for position, cell in enumerate(cells):
+            if cell not in BOARD_CELLS:
+                raise ValueError(f"棋盘第 {position + 1} 个格子 {cell!r} 无效，只允许 {BOARD_CELLS!r}")
+        return np.array([int(cell) for cell in cells.replace(".", "0")], dtype=int).reshape(8, 8)
+    board = np.array(value, dtype=int)
+    if board.size != 64:
+        raise ValueError("棋盘必须有64个格子")
+    low, high = CELL_RANGE
+    invalid = np.flatnonzero((board < low) | (board > high))
+    if len(invalid):
+        raise ValueError(f"棋盘第 {invalid[0] + 1} 个格子的值 {board.flat[invalid[0]]} 超出范围 {low}..{high}")
+    return board.reshape(8, 8)
+
+
+def parse_pieces(value):
+    """把字典或 "Q1R2" 形式的棋子数量转换为字典"""
+    if isinstance(value, dict):
+        pieces = {piece_type: int(count) for piece_type, count in value.items()}
+    else:
+        pieces = {}
+        for piece_type, count in re.findall(r"([A-Za-z])\s*(\d+)", value):
+            pieces[piece_type.upper()] = pieces.get(piece_type.upper(), 0) + int(count)
+    unknown = set(pieces) - set(PIECE_TYPES)
+    if unknown:
+        raise ValueError(f"未知的棋子类型: {sorted(unknown)}")
+    return pieces
+
+
+def parse_puzzle(line, index, location=None):
+    """解析一行输入，返回 (谜题编号, 棋盘, 棋子数量)；location 为 "文件:行号"，格式错误时附在错误信息前"""
+    try:
+        return _parse_puzzle_line(line.strip(), index)
+    except (ValueError, KeyError) as e:
+        message = f"缺少字段 {e}" if isinstance(e, KeyError) else str(e)
+        raise ValueError(f"{location}: {message}" if location else message) from None
+
+
+def _parse_puzzle_line(line, index):
+    if line.startswith("{"):
+        record = json.loads(line)
+        return record.get("id", index), parse_board(record["board"]), parse_pieces(record.get("pieces", {}))
+    board, _, pieces = line.partition(" ")
+    return index, parse_board(board), parse_pieces(pieces)
+
+
+def read_lines(paths):
+    """依次读取各个输入文件（"-" 表示标准输入）中的非空、非注释行，生成 ("文件:行号", 行)"""
+    for path in paths:
+        stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+        name = "<stdin>" if path == "-" else path
+        try:
+            for line_number, line in enumerate(stream, 1):
+                if line.strip() and not line.lstrip().startswith("#"):
+                    yield f"{name}:{line_number}", line
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def run_solver(mode, board, pieces, time_limit):
+    """用指定的求解方式求解一个谜题，返回 SolveResult"""
+    if mode == "exact":
+        return exact_search_solution(board, pieces, time_budget=time_limit)
+    if mode == "widening":
+        return iterative_widening_solution(board, pieces, time_budget=time_limit)
+    if mode == "lns":
+        return polished_beam_solution(board, pieces, time_budget=time_limit)
+    if mode == "mcts":
+        return mcts_solution(board, pieces, time_budget=time_limit)
+    if mode == "portfolio":
+        return PortfolioSolver(deadline=time_limit).solve(board, pieces)
+    stats = SearchStats()
+    deadline = time.time() + time_limit
+    if mode == "batched":
+        solution = batched_beam_search_solution(board, pieces, beam_width=200, max_depth=64, deadline=deadline,
+                                                stats=stats)
+    else:
+        solution = beam_search_solution(board, pieces, engine="bitboard", deadline=deadline, stats=stats)
+    return SolveResult(solution, False, stats.expanded, stats.elapsed, mode, stats)
+
+
+def solve_puzzle(index, line, mode, time_limit, include_stats=False, profile_dir=None, location=None):
+    """在工作进程中求解一个谜题，返回结果记录
+
+    include_stats 为真时在记录中附上求解统计；给出 profile_dir 时用 cProfile 分析求解过程，
+    每个谜题的结果写入该目录下的 puzzle-<序号>.prof。location 为输入所在的 "文件:行号"。
+    """
+    start_time = time.time()
+    record = {"index": index}
+    try:
+        puzzle_id, board, pieces = parse_puzzle(line, index, location)
+        record["id"] = puzzle_id
+        solver = run_solver
+        if profile_dir is not None:
+            solver = profile_solver(run_solver, os.path.join(profile_dir, f"puzzle-{index}.prof"))
+        # 求解函数会打印进度，工作进程中丢弃这些输出，避免混入结果流
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = solver(mode, board, pieces, time_limit)
+    except Exception as e:
+        record.update(status="error", error=str(e), elapsed=round(time.time() - start_time, 4))
+        return record
+
+    if result.solution is not None:
+        status = "solved"
+    elif result.optimal:
+        status = "infeasible"
+    else:
+        status = "unknown"
+    record.update(
+        status=status,
+        pieces=None if result.solution is None else len(result.solution),
+        optimal=result.optimal,
+        mode=result.mode,
+        solution=None if result.solution is None else [[piece_type, x, y] for piece_type, x, y in result.solution],
+        elapsed=round(time.time() - start_time, 4),
+    )
+    if include_stats and result.stats is not None:
+        record["stats"] = result.stats.as_dict()
+    return record
+
+
+class ThroughputStats:
+    """批量求解的吞吐统计"""
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.counts = {}
+        self.solve_time = 0.0
+
+    def add(self, record):
+        self.counts[record["status"]] = self.counts.get(record["status"], 0) + 1
+        self.solve_time += record.get("elapsed", 0.0)
+
+    def summary(self):
+        total = sum(self.counts.values())
+        elapsed = time.time() - self.start_time
+        rate = total / elapsed if elapsed > 0 else 0.0
+        mean = self.solve_time / total if total else 0.0
+        return (f"共 {total} 个谜题，解出 {self.counts.get('solved', 0)}，无解 {self.counts.get('infeasible', 0)}，"
+                f"未知 {self.counts.get('unknown', 0)}，出错 {self.counts.get('error', 0)}；"
+                f"用时 {elapsed:.2f}秒，{rate:.2f} 个/秒，平均每个 {mean:.3f}秒")
+
+
+def run_batch(lines, mode="exact", time_limit=5.0, workers=None, order="input", output=sys.stdout,
+              progress_every=0, include_stats=False, profile_dir=None):
+    """流式求解：进程池中最多同时保留 2*workers 个谜题，按输入顺序或完成顺序输出结果
+
+    lines 中每一项为一行输入，或 read_lines 生成的 ("文件:行号", 行)。
+    工作进程崩溃（进程池损坏）或结果无法取回时，受影响的谜题记为出错，换一个新的进程池继续求解其余谜题。
+    """
+    stats = ThroughputStats()
+    pending = {}  # future -> (输入序号, "文件:行号")
+    finished = {}  # 输入顺序输出时暂存已完成但尚未轮到的结果
+    next_index = 0
+
+    def emit(record):
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+        stats.add(record)
+        if progress_every and sum(stats.counts.values()) % progress_every == 0:
+            print(stats.summary(), file=sys.stderr)
+
+    def collect(done):
+        nonlocal next_index
+        for future in done:
+            index, location = pending.pop(future)
+            try:
+                record = future.result()
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                record = {"index": index, "status": "error", "error": f"{location}: {error}" if location else error,
+                          "elapsed": 0.0}
+            if order == "completion":
+                emit(record)
+            else:
+                finished[index] = record
+        while next_index in finished:
+            emit(finished.pop(next_index))
+            next_index += 1
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = 2 * workers
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        for index, line in enumerate(lines):
+            location, line = line if isinstance(line, tuple) else (None, line)
+            if len(pending) >= max_pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            args = (solve_puzzle, index, line, mode, time_limit, include_stats, profile_dir, location)
+            try:
+                future = executor.submit(*args)
+            except BrokenProcessPool:
+                # 某个工作进程崩溃后进程池不能再用，已提交的谜题会各自得到出错记录
+                executor.shutdown(wait=False)
+                executor = ProcessPoolExecutor(max_workers=workers)
+                future = executor.submit(*args)
+            pending[future] = (index, location)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    finally:
+        executor.shutdown()
+
+    print(stats.summary(), file=sys.stderr)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批量求解 Chess Bomb 谜题（无界面）")
+    parser.add_argument("inputs", nargs="*", default=["-"], help="输入文件，默认或 - 表示标准输入")
+    parser.add_argument("--mode", choices=SOLVER_MODES, default="exact", help="求解方式")
+    parser.add_argument("--time-limit", type=float, default=5.0, help="每个谜题的时间预算（秒）")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数，默认为CPU核数")
+    parser.add_argument("--order", choices=("input", "completion"), default="input", help="结果输出顺序")
+    parser.add_argument("--progress-every", type=int, default=0, help="每完成多少个谜题打印一次统计")
+    parser.add_argument("--stats", action="store_true", help="在结果中附上计数、分阶段用时和束健康状况")
+    parser.add_argument("--profile", metavar="DIR", help="用 cProfile 分析每个谜题的求解，结果写入该目录")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+    run_batch(read_lines(args.inputs), args.mode, args.time_limit, args.workers, args.order,
+              progress_every=args.progress_every, include_stats=args.stats, profile_dir=args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""求解器基准测试
+
+用固定的随机种子生成谜题集，用每种求解方式依次求解，记录用时、每秒展开节点数、内存峰值、成功率和棋子数，
+用时和内存峰值分两轮测量，计时的一轮不开启 tracemalloc，避免跟踪开销拖慢各求解方式的程度不同而扭曲比较。
+结果写入JSON文件，并可与保存的基准结果比较，找出变差的指标。
+
+谜题集包含两类：
+- 随机谜题：按密度和白/灰/首领骷髅的比例随机放置骷髅；
+- 埋入解的谜题：先随机选好若干次放置，再由它们反推出骷髅（每个骷髅的生命值不超过它受到的攻击次数），
+  因此已知一个不超过这么多棋子的解，可以用来衡量解的质量。
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from batch_solve import SOLVER_MODES, run_solver
+from bomb_solver import ATTACK_MASKS, PIECE_TYPES, BitboardState
+
+# 默认不测试组合求解：它在子进程中运行，无法统计内存，用时也取决于CPU核数
+DEFAULT_MODES = [mode for mode in SOLVER_MODES if mode != "portfolio"]
+
+
+def random_puzzle(rng, density=0.4, mix=(6, 3, 1), inventory=4):
+    """按密度和骷髅比例随机生成棋盘，每种棋子的数量在 1..inventory 之间"""
+    board = np.zeros((8, 8), dtype=int)
+    for index in rng.sample(range(64), max(1, round(64 * density))):
+        board[index // 8, index % 8] = rng.choices((1, 2, 3), weights=mix)[0]
+    pieces = {piece_type: rng.randint(1, inventory) for piece_type in PIECE_TYPES}
+    return board, pieces, None
+
+
+def planted_puzzle(rng, placements=6, mix=(6, 3, 1), slack=1):
+    """反推出一个已知解的谜题：先选好放置，再在受到攻击的格子上放生命值不超过受攻击次数的骷髅
+
+    放置的格子本身保持为空，所以埋入的放置按任意顺序都合法。slack 为每种棋子额外多给的数量。
+    """
+    squares = rng.sample(range(64), placements)
+    planted = [(rng.choice(PIECE_TYPES), square) for square in squares]
+    hits = [0] * 64
+    for piece_type, square in planted:
+        attack = ATTACK_MASKS[piece_type][square]
+        for index in range(64):
+            hits[index] += attack >> index & 1
+
+    board = np.zeros((8, 8), dtype=int)
+    for index in range(64):
+        if hits[index] and index not in squares and rng.random() < 0.7:
+            health = rng.choices((1, 2, 3), weights=mix)[0]
+            board[index // 8, index % 8] = min(health, hits[index])
+    if not board.any():
+        return planted_puzzle(rng, placements, mix, slack)
+
+    pieces = {piece_type: slack for piece_type in PIECE_TYPES}
+    for piece_type, _ in planted:
+        pieces[piece_type] += 1
+    solution = [(piece_type, square // 8, square % 8) for piece_type, square in planted]
+    return board, pieces, solution
+
+
+def generate_corpus(seed=0, count=20, planted=0.5, density=0.4, mix=(6, 3, 1), inventory=4, placements=6):
+    """生成谜题集 [(编号, 棋盘, 棋子数量, 已知解或None), ...]，planted 为埋入解的谜题的比例"""
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(count):
+        if rng.random() < planted:
+            board, pieces, solution = planted_puzzle(rng, placements, mix)
+            corpus.append((f"planted-{index}", board, pieces, solution))
+        else:
+            board, pieces, solution = random_puzzle(rng, density, mix, inventory)
+            corpus.append((f"random-{index}", board, pieces, solution))
+    return corpus
+
+
+def is_valid_solution(board, pieces, solution):
+    """按顺序模拟放置，检查解是否合法且消灭了所有骷髅"""
+    state = BitboardState(board, pieces)
+    for piece_type, x, y in solution:
+        if not state.apply(piece_type, x, y):
+            return False
+    return state.is_solved()
+
+
+# 用时在不开启 tracemalloc 的情况下测量，内存峰值在单独开启 tracemalloc 的一轮中测量；
+# 写入结果文件，比较时只比较测量方式相同的用时
+TIMING_METHOD = "untraced"
+
+
+def solve_quietly(mode, board, pieces, time_limit):
+    """求解一个谜题并丢弃进度输出，返回 (结果, 用时, 错误信息)"""
+    start_time = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = run_solver(mode, board, pieces, time_limit)
+        error = None
+    except Exception as e:
+        result, error = None, str(e)
+    return result, time.perf_counter() - start_time, error
+
+
+def measure_peak_memory(mode, board, pieces, time_limit):
+    """开启 tracemalloc 再求解一次，返回内存峰值（字节）；这一轮的用时受跟踪拖慢，不予记录"""
+    tracemalloc.start()
+    try:
+        solve_quietly(mode, board, pieces, time_limit)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_benchmark(corpus, modes, time_limit=2.0, measure_memory=True):
+    """用每种求解方式求解整个谜题集，返回 {求解方式: 汇总}, [每个谜题的记录]
+
+    每个谜题先在不跟踪内存的情况下求解并计时；measure_memory 为真时再开启 tracemalloc 单独求解一次测内存峰值。
+    """
+    records = []
+    summary = {}
+    for mode in modes:
+        solved = pieces_total = planted_gap = planted_count = nodes = 0
+        times = []
+        peak_memory = 0
+        for puzzle_id, board, pieces, planted in corpus:
+            result, elapsed, error = solve_quietly(mode, board, pieces, time_limit)
+            peak = measure_peak_memory(mode, board, pieces, time_limit) if measure_memory else None
+
+            solution = result.solution if result is not None else None
+            valid = solution is not None and is_valid_solution(board, pieces, solution)
+            record = {"mode": mode, "id": puzzle_id, "elapsed": round(elapsed, 4),
+                      "peak_kb": peak // 1024 if peak is not None else None,
+                      "nodes": result.nodes if result is not None else 0, "solved": valid,
+                      "pieces": len(solution) if valid else None,
+                      "planted": len(planted) if planted is not None else None}
+            if error is not None:
+                record["error"] = error
+            records.append(record)
+
+            times.append(elapsed)
+            if peak is not None:
+                peak_memory = max(peak_memory, peak)
+            nodes += record["nodes"]
+            if valid:
+                solved += 1
+                pieces_total += len(solution)
+                if planted is not None:
+                    planted_gap += len(solution) - len(planted)
+                    planted_count += 1
+
+        total_time = sum(times)
+        summary[mode] = {
+            "puzzles": len(corpus),
+            "success_rate": round(solved / len(corpus), 4) if corpus else 0.0,
+            "mean_pieces": round(pieces_total / solved, 4) if solved else None,
+            "planted_gap": round(planted_gap / planted_count, 4) if planted_count else None,
+            "mean_time": round(total_time / len(corpus), 4) if corpus else 0.0,
+            "max_time": round(max(times), 4) if times else 0.0,
+            "nodes_per_second": round(nodes / total_time, 1) if nodes and total_time > 0 else None,
+            "peak_memory_kb": peak_memory // 1024 if measure_memory else None,
+            "timing": TIMING_METHOD,
+        }
+        print(f"{mode}: {summary[mode]}", file=sys.stderr)
+    return summary, records
+
+
+def compare_with_baseline(summary, baseline, tolerance=0.2):
+    """与基准结果比较，返回变差的指标说明列表
+
+    成功率下降或平均棋子数增加即视为变差；用时和内存峰值超过基准的 (1 + tolerance) 倍才视为变差。
+    用时只在两边的测量方式（timing 字段）相同时比较。
+    """
+    regressions = []
+    for mode, current in summary.items():
+        previous = baseline.get(mode)
+        if previous is None:
+            continue
+        if current["success_rate"] < previous["success_rate"]:
+            regressions.append(f"{mode}: 成功率 {previous['success_rate']} -> {current['success_rate']}")
+        if (current["mean_pieces"] is not None and previous["mean_pieces"] is not None
+                and current["mean_pieces"] > previous["mean_pieces"] and
+                current["success_rate"] >= previous["success_rate"]):
+            regressions.append(f"{mode}: 平均棋子数 {previous['mean_pieces']} -> {current['mean_pieces']}")
+        # 旧的基准结果在 tracemalloc 下计时，用时不可比，只比较其余指标
+        keys = [("peak_memory_kb", "内存峰值")]
+        if previous.get("timing") == current.get("timing"):
+            keys.insert(0, ("mean_time", "平均用时"))
+        for key, name in keys:
+            if previous.get(key) and current.get(key) is not None and current[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{mode}: {name} {previous[key]} -> {current[key]}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chess Bomb 求解器基准测试")
+    parser.add_argument("--seed", type=int, default=0, help="谜题集的随机种子")
+    parser.add_argument("--count", type=int, default=20, help="谜题数量")
+    parser.add_argument("--planted", type=float, default=0.5, help="埋入解的谜题比例")
+    parser.add_argument("--density", type=float, default=0.4, help="随机谜题的骷髅密度")
+    parser.add_argument("--mix", default="6,3,1", help="白、灰、首领骷髅的比例")
+    parser.add_argument("--inventory", type=int, default=4, help="随机谜题每种棋子的最大数量")
+    parser.add_argument("--placements", type=int, default=6, help="埋入解的放置数")
+    parser.add_argument("--modes", default=",".join(DEFAULT_MODES), help="逗号分隔的求解方式")
+    parser.add_argument("--time-limit", type=float, default=2.0, help="每个谜题的时间预算（秒）")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果文件")
+    parser.add_argument("--baseline", help="用于比较的基准结果文件")
+    parser.add_argument("--no-memory", action="store_true", help="不单独测量内存峰值，省去第二轮求解")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="用时和内存允许变差的比例")
+    args = parser.parse_args(argv)
+
+    modes = [mode for mode in args.modes.split(",") if mode]
+    unknown = set(modes) - set(SOLVER_MODES)
+    if unknown:
+        parser.error(f"未知的求解方式: {sorted(unknown)}")
+    mix = tuple(float(weight) for weight in args.mix.split(","))
+
+    corpus = generate_corpus(args.seed, args.count, args.planted, args.density, mix, args.inventory,
+                             args.placements)
+    summary, records = run_benchmark(corpus, modes, args.time_limit, not args.no_memory)
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                        "machine": platform.machine()},
+        "summary": summary,
+        "records": records,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(summary, baseline["summary"], args.tolerance)
+        if regressions:
+            print("与基准相比变差的指标：", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            return 1
+        print("与基准相比没有变差的指标", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
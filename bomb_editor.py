@@ -1,269 +1,45 @@
 import numpy as np
 import pygame
 import os
-import time
+import functools
 import threading
+import time
 
-# 定义骷髅类型
-WHITE_SKULL = 1
-GRAY_SKULL = 2
-BOSS_SKULL = 3
-
-# 定义棋子类型
-PAWN = 'P'
-KNIGHT = 'N'
-BISHOP = 'B'
-ROOK = 'R'
-QUEEN = 'Q'
-KING = 'K'
-
-# 棋子中文名称
-PIECE_NAMES = {
-    PAWN: "兵",
-    KNIGHT: "马",
-    BISHOP: "象",
-    ROOK: "车",
-    QUEEN: "皇后",
-    KING: "王"
-}
-
-
-def precalculate_attack_patterns():
-    """预计算每种棋子在每个位置的攻击范围"""
-    attack_patterns = {}
-
-    # 为每种棋子类型计算攻击模式
-    for piece_type in [PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING]:
-        attack_patterns[piece_type] = {}
-        for x in range(8):
-            for y in range(8):
-                affected_cells = set()
-
-                if piece_type == PAWN:
-                    # 兵攻击十字形
-                    for dx, dy in [(0, 1), (0, 2), (0, -1), (0, -2), (1, 0), (2, 0), (-1, 0), (-2, 0)]:
-                        nx, ny = x + dx, y + dy
-                        if 0 <= nx < 8 and 0 <= ny < 8:
-                            affected_cells.add((nx, ny))
-
-                elif piece_type == KNIGHT:
-                    # 马的日字型移动
-                    knight_moves = [
-                        (-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                        (1, -2), (1, 2), (2, -1), (2, 1)
-                    ]
-                    for dx, dy in knight_moves:
-                        nx, ny = x + dx, y + dy
-                        if 0 <= nx < 8 and 0 <= ny < 8:
-                            affected_cells.add((nx, ny))
-
-                elif piece_type == BISHOP:
-                    # 象攻击对角线
-                    for dx, dy in [(1, 1), (1, -1), (-1, 1), (-1, -1)]:
-                        nx, ny = x, y
-                        while True:
-                            nx += dx
-                            ny += dy
-                            if 0 <= nx < 8 and 0 <= ny < 8:
-                                affected_cells.add((nx, ny))
-                            else:
-                                break
-
-                elif piece_type == ROOK:
-                    # 车攻击同行同列
-                    for i in range(8):
-                        if i != x:
-                            affected_cells.add((i, y))
-                        if i != y:
-                            affected_cells.add((x, i))
-
-                elif piece_type == QUEEN:
-                    # 皇后攻击同行、同列和对角线
-                    # 同行同列
-                    for i in range(8):
-                        if i != x:
-                            affected_cells.add((i, y))
-                        if i != y:
-                            affected_cells.add((x, i))
-
-                    # 对角线
-                    for dx, dy in [(1, 1), (1, -1), (-1, 1), (-1, -1)]:
-                        nx, ny = x, y
-                        while True:
-                            nx += dx
-                            ny += dy
-                            if 0 <= nx < 8 and 0 <= ny < 8:
-                                affected_cells.add((nx, ny))
-                            else:
-                                break
-
-                elif piece_type == KING:
-                    # 王攻击周围8个位置
-                    for dx in [-1, 0, 1]:
-                        for dy in [-1, 0, 1]:
-                            if dx == 0 and dy == 0:
-                                continue
-                            nx, ny = x + dx, y + dy
-                            if 0 <= nx < 8 and 0 <= ny < 8:
-                                affected_cells.add((nx, ny))
-
-                attack_patterns[piece_type][(x, y)] = affected_cells
-
-    return attack_patterns
-
-
-# 全局变量，用于缓存攻击模式
-ATTACK_PATTERNS = precalculate_attack_patterns()
-
-
-class ChessState:
-    def __init__(self, board, available_pieces=None):
-        self.board = board  # 棋盘状态
-        self.bombs_used = []  # 已使用棋子的列表
-        if available_pieces is None:
-            self.available_pieces = {
-                PAWN: 0,
-                KNIGHT: 0,
-                BISHOP: 0,
-                ROOK: 0,
-                QUEEN: 0,
-                KING: 0
-            }
-        else:
-            self.available_pieces = available_pieces.copy()  # 使用副本避免修改原始数据
-
-    def copy(self):
-        new_state = ChessState(np.copy(self.board), self.available_pieces.copy())
-        new_state.bombs_used = self.bombs_used.copy()
-        return new_state
-
-    def get_affected_cells(self, piece_type, x, y):
-        """获取特定棋子在位置(x, y)能攻击到的所有位置"""
-        return ATTACK_PATTERNS[piece_type][(x, y)]
-
-    def place_piece(self, piece_type, x, y):
-        """放置棋子并攻击骷髅"""
-        if self.board[x][y] != 0 or self.available_pieces[piece_type] <= 0:
-            return None
-
-        new_state = self.copy()
-        new_state.board[x][y] = -1  # 标记为已放置棋子
-        new_state.available_pieces[piece_type] -= 1
-        new_state.bombs_used.append((piece_type, x, y))
-
-        # 获取受影响的单元格
-        affected_cells = self.get_affected_cells(piece_type, x, y)
-
-        # 应用伤害
-        for i, j in affected_cells:
-            if new_state.board[i][j] > 0:
-                new_state.board[i][j] -= 1
-
-        return new_state
-
-    def is_solved(self):
-        """检查是否所有骷髅都被消灭"""
-        return np.all(self.board <= 0)
-
-    def remaining_health(self):
-        """返回剩余的骷髅总生命值"""
-        return np.sum(np.maximum(self.board, 0))
-
-    def calculate_piece_efficiency(self, piece_type, x, y):
-        """计算在某个位置放置棋子能消灭的生命值总和"""
-        if self.board[x][y] != 0 or self.available_pieces[piece_type] <= 0:
-            return -1  # 不能在非空格子放置棋子或没有可用棋子
-
-        damage = 0
-        affected_cells = self.get_affected_cells(piece_type, x, y)
-
-        # 计算伤害
-        for i, j in affected_cells:
-            if self.board[i][j] > 0:
-                damage += 1
-
-        return damage
-
-
-# 求解函数
-def beam_search_solution(initial_board, available_pieces, beam_width=10, max_depth=15):
-    """使用束搜索算法找到一个可行解"""
-    start_time = time.time()
-
-    initial_state = ChessState(initial_board, available_pieces)
-    beam = [initial_state]  # 当前束
-
-    for depth in range(max_depth):
-        if not beam:
-            break
-
-        # 如果找到了解，直接返回
-        for state in beam:
-            if state.is_solved():
-                print(f"束搜索在深度 {depth} 找到了解决方案，使用 {len(state.bombs_used)} 个棋子")
-                return state.bombs_used
-
-        # 生成所有可能的下一步状态
-        candidates = []
-        for state in beam:
-            # 只考虑还有骷髅的状态
-            if state.is_solved():
-                continue
-
-            # 找出效率最高的几个移动
-            moves = []
-            for x in range(8):
-                for y in range(8):
-                    if state.board[x][y] == 0:  # 只能在空格子放置
-                        for piece_type in state.available_pieces.keys():
-                            if state.available_pieces[piece_type] <= 0:
-                                continue  # 没有可用的该类型棋子
-
-                            efficiency = state.calculate_piece_efficiency(piece_type, x, y)
-                            if efficiency > 0:
-                                moves.append((efficiency, piece_type, x, y))
-
-            # 按效率从高到低排序
-            moves.sort(reverse=True)
-
-            # 只考虑效率最高的前几个移动
-            for efficiency, piece_type, x, y in moves[:5]:  # 每个状态只扩展最好的5个移动
-                next_state = state.place_piece(piece_type, x, y)
-                if next_state:
-                    # 计算启发式评估值（剩余生命值越少越好）
-                    heuristic = next_state.remaining_health()
-                    candidates.append((heuristic, len(next_state.bombs_used), id(next_state), next_state))
-
-
-        if not candidates:
-            return None
-
-        # 按照启发式评估值排序，选择最好的几个状态作为新的束
-        candidates.sort()  # 现在sort会使用元组比较，先比较heuristic，再比较长度，最后比较id
-        beam = [state for _, _, _, state in candidates[:beam_width]]  # 保留最好的beam_width个状态
-
-        # 打印进度
-        best_health = beam[0].remaining_health()
-        total_pieces = len(beam[0].bombs_used)
-        elapsed = time.time() - start_time
-        print(
-            f"深度 {depth + 1}，最佳状态剩余生命值: {best_health}，已使用棋子: {total_pieces}，用时: {elapsed:.2f}秒")
-
-    # 检查最后的束中是否有解决方案
-    for state in beam:
-        if state.is_solved():
-            return state.bombs_used
+from bomb_solver import (
+    WHITE_SKULL, GRAY_SKULL, BOSS_SKULL,
+    PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING,
+    PIECE_NAMES,
+    DamageHeatmap,
+    SolutionCache,
+    SolveMonitor,
+    check_feasibility,
+    decomposed_solution,
+    exact_search_solution,
+    iter_solve,
+    profile_solver,
+    solve_canonical,
+)
 
-    return None
 
 class BoardEditor:
     def __init__(self):
         # 初始化pygame
         pygame.init()
 
+        # 求解线程用自定义事件唤醒主循环：有新进度时（最多每 PROGRESS_INTERVAL 秒一次）和求解结束时
+        self.SOLVE_PROGRESS = pygame.event.custom_type()
+        self.SOLVE_DONE = pygame.event.custom_type()
+        self.PROGRESS_INTERVAL = 0.1
+
         self.solution = None  # 存储求解结果
         self.solving = False  # 表示是否正在求解
         self.solution_message = ""  # 求解结果消息
+        self.progress = None  # 最近一次的求解进度（SolveProgress），由求解线程更新
+        self.monitor = None  # 当前求解的 SolveMonitor，用于取消
+        self.stats = None  # 最近一次求解的 SearchStats
+        self.show_stats = False  # 信息栏显示求解统计而不是解法步骤
+        # 设置环境变量 CHESSBOMB_PROFILE 为文件路径时，用 cProfile 分析每次求解并写入该文件
+        self.profile_path = os.environ.get("CHESSBOMB_PROFILE")
 
         # 设置窗口尺寸和标题
         self.WIDTH, self.HEIGHT = 750, 750
@@ -303,6 +79,7 @@ class BoardEditor:
 
         # 加载字体
         self.font = pygame.font.Font("assets/font/simsun.ttc", 24)
+        self.small_font = pygame.font.Font("assets/font/simsun.ttc", 16)  # 热力图格子中的标注
         self.title_font = pygame.font.SysFont("assets/font/simsun.ttc", 30, bold=True)
         # 骷髅颜色
         self.SKULL_COLORS = {
@@ -327,6 +104,9 @@ class BoardEditor:
                     self.skull_images[skull_type] = pygame.transform.scale(img, (self.CELL_SIZE - 12, self.CELL_SIZE - 12))
         except Exception as e:
             print(f"加载骷髅图像时出错: {e}")
+        # 选择器中使用的小图标，只缩放一次
+        self.skull_icons = {skull_type: pygame.transform.scale(img, (20, 20))
+                            for skull_type, img in self.skull_images.items()}
         # 尝试加载棋子图像
         self.piece_images = {}
         try:
@@ -347,9 +127,34 @@ class BoardEditor:
         except Exception as e:
             print(f"加载棋子图像时出错: {e}")
 
+        # 棋子数量编辑器中的各行
+        self.PIECE_ROWS = [
+            ("Queen", QUEEN),
+            ("Rook", ROOK),
+            ("Bishop", BISHOP),
+            ("Knight", KNIGHT),
+            ("King", KING),
+            ("Pawn", PAWN)
+        ]
+
+        # 保留式绘制：不变的部分预先画在背景上，文字渲染结果缓存；
+        # 之后只重画标记为需要更新的格子和分区，并只提交这些区域
+        self.REGION_NAMES = ("board", "selector", "pieces", "actions", "info")
+        self.text_cache = {}
+        self.heat_surfaces = {}  # 热力图各伤害等级的半透明覆盖层
+        self.dirty_cells = set()
+        self.dirty_regions = set()
+        self.background = self.build_background()
+
         # 创建初始棋盘数据
         self.board_data = np.zeros((8, 8), dtype=int)
 
+        # 最佳移动热力图（DamageHeatmap），为 None 时不显示；每次编辑只增量更新受影响的格子
+        self.heatmap = None
+
+        # 持久化的解缓存
+        self.solution_cache = SolutionCache("solution_cache.sqlite3")
+
         # 当前选中的骷髅类型
         self.current_skull_type = WHITE_SKULL
 
@@ -363,25 +168,138 @@ class BoardEditor:
             KING: 0
         }
 
+    def render_text(self, text, color=None, font=None):
+        """渲染文字；相同的文字、颜色和字体复用缓存的表面，不必每次重新排版字形"""
+        font = font or self.font
+        key = (text, color or self.BLACK, id(font))
+        surface = self.text_cache.get(key)
+        if surface is None:
+            if len(self.text_cache) >= 1024:
+                self.text_cache.clear()  # 进度中的数字不断变化，缓存满时整体清空
+            surface = self.text_cache[key] = font.render(text, True, key[1])
+        return surface
+
+    def heat_surface(self, damage):
+        """热力图中伤害为 damage 的格子的半透明覆盖层，伤害越高颜色越深（8 以上相同）"""
+        level = min(damage, 8)
+        surface = self.heat_surfaces.get(level)
+        if surface is None:
+            surface = pygame.Surface((self.CELL_SIZE, self.CELL_SIZE), pygame.SRCALPHA)
+            surface.fill((255, 215, 0, 50 + level * 20))
+            self.heat_surfaces[level] = surface
+        return surface
+
+    def build_background(self):
+        """把不会变化的部分（棋盘边框和坐标、各面板的边框和标题、棋子名称和加减按钮、提示文字）画到背景表面上"""
+        background = pygame.Surface((self.WIDTH, self.HEIGHT))
+        background.fill(self.WHITE)
+
+        # 棋盘边框和坐标
+        board_rect = pygame.Rect(28, 10, self.BOARD_SIZE, self.BOARD_SIZE)  # 向右移动棋盘位置
+        pygame.draw.rect(background, self.BLACK, board_rect, 2)
+        for i in range(8):
+            # 行号（8-1）和列号（a-h）
+            background.blit(self.render_text(str(8 - i)), (15, 10 + i * self.CELL_SIZE + self.CELL_SIZE // 2 - 8))
+            background.blit(self.render_text(chr(97 + i)),
+                            (30 + i * self.CELL_SIZE + self.CELL_SIZE // 2 - 5, self.BOARD_SIZE + 15))
+
+        # 骷髅类型选择器的边框和标题
+        skull_area = pygame.Rect(self.BOARD_SIZE + 60, 10, 320, 120)  # 调整大小
+        pygame.draw.rect(background, self.GRAY, skull_area, 2, 10)
+        background.blit(self.render_text("选择骷髅类型:"), (skull_area.x + 15, skull_area.y + 15))
+
+        # 棋子数量编辑器：背景、标题、每行的图像、名称和加减按钮
+        pieces_area = pygame.Rect(self.BOARD_SIZE + 60, 140, 320, 280)  # 增加区域大小
+        pygame.draw.rect(background, self.GRAY, pieces_area, 0, 10)
+        background.blit(self.render_text("可用棋子数量:"), (pieces_area.x + 15, pieces_area.y + 15))
+        for i, (name, piece_type) in enumerate(self.PIECE_ROWS):
+            row_rect = pygame.Rect(pieces_area.x + 20, pieces_area.y + 50 + i * 35, 280, 30)  # 增加行高
+            pygame.draw.rect(background, self.WHITE, row_rect, 0, 5)
+            if piece_type in self.piece_images:
+                background.blit(self.piece_images[piece_type], (row_rect.x + 10, row_rect.y + 3))
+            background.blit(self.render_text(name), (row_rect.x + 40, row_rect.y + 5))
+
+            minus_rect = pygame.Rect(row_rect.x + 200, row_rect.y + 3, 25, 25)
+            pygame.draw.rect(background, self.RED, minus_rect, 0, 5)
+            background.blit(self.render_text("-", self.WHITE), (minus_rect.x + 8, minus_rect.y + 1))
+            plus_rect = pygame.Rect(row_rect.x + 240, row_rect.y + 3, 25, 25)
+            pygame.draw.rect(background, self.GREEN, plus_rect, 0, 5)
+            background.blit(self.render_text("+", self.WHITE), (plus_rect.x + 7, plus_rect.y - 1))
+
+        # 提示信息
+        background.blit(self.render_text("左键点击棋盘放置骷髅"), (30, self.BOARD_SIZE + 40))
+        background.blit(self.render_text("右键点击棋盘清除骷髅"), (30, self.BOARD_SIZE + 70))
+        return background
+
+    def restore_background(self, rect):
+        """用背景覆盖一个区域，准备重画其中会变化的内容"""
+        self.screen.blit(self.background, rect, rect)
+
+    def invalidate(self, *regions):
+        """标记需要重画的分区（见 REGION_NAMES），下一次 render 时重画"""
+        self.dirty_regions.update(regions)
+
+    def invalidate_cell(self, row, col):
+        """标记需要重画的棋盘格子"""
+        self.dirty_cells.add((row, col))
+
+    def invalidate_squares(self, squares):
+        """标记一组格子序号 (x*8+y) 需要重画"""
+        for index in squares:
+            self.invalidate_cell(*divmod(int(index), 8))
+
+    def toggle_heatmap(self):
+        """打开或关闭最佳移动热力图"""
+        self.heatmap = None if self.heatmap is not None else DamageHeatmap(self.board_data, self.available_pieces)
+        self.invalidate("board", "actions")
+
+    def render(self):
+        """只重画标记过的格子和分区，并只把这些区域提交到显示器；没有变化时什么也不做"""
+        rects = [self.draw_cell(row, col) for row, col in self.dirty_cells]
+        draw = {"board": self.draw_board, "selector": self.draw_skull_selector, "pieces": self.draw_piece_editor,
+                "actions": self.draw_action_buttons, "info": self.draw_info_panel}
+        for name in self.REGION_NAMES:
+            if name in self.dirty_regions:
+                rects.append(draw[name]())
+        self.dirty_cells.clear()
+        self.dirty_regions.clear()
+        if rects:
+            pygame.display.update(rects)
+
     def draw_info_panel(self):
-        """绘制信息面板"""
+        """绘制信息面板，返回需要更新的区域"""
         panel_rect = pygame.Rect(self.INFO_PANEL_X, self.INFO_PANEL_Y,
                                  self.INFO_PANEL_WIDTH, self.INFO_PANEL_HEIGHT)
+        # 较长的解法步骤会超出面板，重画的区域一直延伸到窗口底部
+        region = pygame.Rect(0, self.INFO_PANEL_Y, self.WIDTH, self.HEIGHT - self.INFO_PANEL_Y)
+        self.restore_background(region)
         pygame.draw.rect(self.screen, (245, 245, 245), panel_rect, 0, 10)
         pygame.draw.rect(self.screen, (200, 200, 200), panel_rect, 2, 10)
 
-        title_text = self.font.render(self.info_title, True, self.BLACK)
+        show_stats = self.show_stats and self.stats is not None and not self.solving
+        title_text = self.render_text("搜索统计" if show_stats else self.info_title)
         self.screen.blit(title_text, (self.INFO_PANEL_X + 10, self.INFO_PANEL_Y + 10))
 
+        # 有统计时显示切换按钮
+        self.stats_button_rect = None
+        if self.stats is not None and not self.solving:
+            stats_button = pygame.Rect(self.INFO_PANEL_X + self.INFO_PANEL_WIDTH - 90, self.INFO_PANEL_Y + 10, 80, 25)
+            pygame.draw.rect(self.screen, (230, 230, 230), stats_button, 0, 5)
+            pygame.draw.rect(self.screen, (200, 200, 200), stats_button, 2, 5)
+            stats_text = self.render_text("显示解法" if show_stats else "搜索统计")
+            self.screen.blit(stats_text, (stats_button.centerx - stats_text.get_width() // 2,
+                                          stats_button.centery - stats_text.get_height() // 2))
+            self.stats_button_rect = stats_button
+
         # 绘制状态信息
         if self.solving:
-            status_text = self.font.render("状态：计算中...", True, self.RED)
+            status_text = self.render_text("状态：计算中...", self.RED)
         elif self.solution:
-            status_text = self.font.render("状态：找到解决方案", True, self.GREEN)
+            status_text = self.render_text("状态：找到解决方案", self.GREEN)
         elif self.solution_message:
-            status_text = self.font.render(f"状态：{self.solution_message}", True, self.RED)
+            status_text = self.render_text(f"状态：{self.solution_message}", self.RED)
         else:
-            status_text = self.font.render("状态：等待求解", True, self.BLACK)
+            status_text = self.render_text("状态：等待求解")
 
         self.screen.blit(status_text, (self.INFO_PANEL_X + 10, self.INFO_PANEL_Y + 35))
 
@@ -390,6 +308,28 @@ class BoardEditor:
                          (self.INFO_PANEL_X + 10, self.INFO_PANEL_Y + 60),
                          (self.INFO_PANEL_X + self.INFO_PANEL_WIDTH - 10, self.INFO_PANEL_Y + 60), 1)
 
+        # 求解过程中显示实时进度
+        if self.solving and self.progress is not None:
+            progress = self.progress
+            lines = [f"阶段：{progress.phase}，深度：{progress.depth}"]
+            if progress.best_health is not None:
+                lines.append(f"最好状态剩余生命值：{progress.best_health}")
+            lines.append(f"已展开节点：{progress.nodes}（{progress.nodes_per_second:.0f} 个/秒）")
+            if progress.solution is not None:
+                lines.append(f"目前最好的解：{len(progress.solution)} 个棋子")
+            else:
+                lines.append("尚未找到完整的解")
+            lines.append(f"用时：{progress.elapsed:.1f}秒")
+            for i, line in enumerate(lines):
+                self.screen.blit(self.render_text(line), (self.INFO_PANEL_X + 10, self.INFO_PANEL_Y + 70 + i * 25))
+            return region
+
+        # 求解统计：计数、分阶段用时和束健康状况
+        if show_stats:
+            for i, line in enumerate(self.stats.summary_lines()):
+                self.screen.blit(self.render_text(line), (self.INFO_PANEL_X + 10, self.INFO_PANEL_Y + 70 + i * 25))
+            return region
+
         if self.info_messages:
             y_offset = 70
             x_offset = 0
@@ -400,99 +340,76 @@ class BoardEditor:
                     y_offset = 70
                     x_offset = col_width + 20
 
-                text = self.font.render(message, True, self.BLACK)
+                text = self.render_text(message)
                 self.screen.blit(text, (self.INFO_PANEL_X + 10 + x_offset, self.INFO_PANEL_Y + y_offset))
                 y_offset += 25
+        return region
 
+    def draw_cell(self, row, col):
+        """绘制一个棋盘格子和其中的骷髅，返回格子区域"""
+        rect = pygame.Rect(30 + col * self.CELL_SIZE,  # 向右移动所有格子
+                           10 + row * self.CELL_SIZE,
+                           self.CELL_SIZE, self.CELL_SIZE)
 
-    def draw_board(self):
-        """绘制棋盘和骷髅"""
-        # 绘制棋盘背景
-        board_rect = pygame.Rect(28, 10, self.BOARD_SIZE, self.BOARD_SIZE)  # 向右移动棋盘位置
-        pygame.draw.rect(self.screen, self.BLACK, board_rect, 2)
+        # 绘制交替的棋盘格
+        if (row + col) % 2 == 0:
+            pygame.draw.rect(self.screen, self.LIGHT_BROWN, rect)
+        else:
+            pygame.draw.rect(self.screen, self.DARK_BROWN, rect)
+
+        # 绘制骷髅
+        skull_type = self.board_data[row, col]
+        if skull_type > 0:
+            # 如果有图像就使用图像，否则绘制圆形
+            if skull_type in self.skull_images:
+                img = self.skull_images[skull_type]
+                self.screen.blit(img, (rect.x + 5, rect.y + 5))
+            else:
+                # 绘制不同类型的骷髅
+                pygame.draw.circle(self.screen,
+                                   self.SKULL_COLORS[skull_type],
+                                   (rect.centerx, rect.centery),
+                                   self.CELL_SIZE // 3)
+
+            # 显示骷髅生命值
+            hp_text = self.render_text(str(skull_type))
+            self.screen.blit(hp_text, (rect.centerx - hp_text.get_width() // 2,
+                                       rect.centery - hp_text.get_height() // 2))
+
+        # 热力图：空格子上能造成的最大伤害和对应的棋子
+        elif self.heatmap is not None:
+            best = self.heatmap.best_move(row, col)
+            if best is not None:
+                piece_type, damage = best
+                self.screen.blit(self.heat_surface(damage), rect)
+                label = self.render_text(f"{piece_type}{damage}", self.BLACK, self.small_font)
+                self.screen.blit(label, (rect.centerx - label.get_width() // 2,
+                                         rect.centery - label.get_height() // 2))
+        return rect
 
-        # 绘制棋盘格子和坐标标识
+    def draw_board(self):
+        """绘制所有棋盘格子（边框和坐标在背景中），返回棋盘区域"""
         for row in range(8):
-            # 绘制行号（8-1）
-            row_text = self.font.render(str(8 - row), True, self.BLACK)
-            self.screen.blit(row_text, (15, 10 + row * self.CELL_SIZE + self.CELL_SIZE // 2 - 8))
-
             for col in range(8):
-                # 绘制列号（a-h）
-                if row == 7:
-                    col_text = self.font.render(chr(97 + col), True, self.BLACK)
-                    self.screen.blit(col_text,
-                                     (30 + col * self.CELL_SIZE + self.CELL_SIZE // 2 - 5, self.BOARD_SIZE + 15))
-
-                rect = pygame.Rect(30 + col * self.CELL_SIZE,  # 向右移动所有格子
-                                   10 + row * self.CELL_SIZE,
-                                   self.CELL_SIZE, self.CELL_SIZE)
-
-                # 绘制交替的棋盘格
-                if (row + col) % 2 == 0:
-                    pygame.draw.rect(self.screen, self.LIGHT_BROWN, rect)
-                else:
-                    pygame.draw.rect(self.screen, self.DARK_BROWN, rect)
-
-                # 绘制骷髅
-                skull_type = self.board_data[row, col]
-                if skull_type > 0:
-                    # 如果有图像就使用图像，否则绘制圆形
-                    if skull_type in self.skull_images:
-                        img = self.skull_images[skull_type]
-                        self.screen.blit(img, (rect.x + 5, rect.y + 5))
-                    else:
-                        # 绘制不同类型的骷髅
-                        pygame.draw.circle(self.screen,
-                                           self.SKULL_COLORS[skull_type],
-                                           (rect.centerx, rect.centery),
-                                           self.CELL_SIZE // 3)
-
-                    # 显示骷髅生命值
-                    hp_text = self.font.render(str(skull_type), True, self.BLACK)
-                    self.screen.blit(hp_text, (rect.centerx - hp_text.get_width() // 2,
-                                               rect.centery - hp_text.get_height() // 2))
+                self.draw_cell(row, col)
+        return pygame.Rect(30, 10, self.BOARD_SIZE, self.BOARD_SIZE)
 
     def draw_ui(self):
-        """绘制用户界面元素"""
-        # 清空屏幕
-        self.screen.fill(self.WHITE)
-
-        # 绘制棋盘
+        """完整绘制整个界面（第一帧和窗口需要重绘时使用），之后只按分区重画"""
+        self.screen.blit(self.background, (0, 0))
+        self.dirty_cells.clear()
+        self.dirty_regions.clear()
         self.draw_board()
-
-
-        # 绘制骷髅类型选择区域
         self.draw_skull_selector()
-
-        # 绘制棋子数量编辑器
         self.draw_piece_editor()
-
-        # 绘制操作按钮
         self.draw_action_buttons()
-
-        # 绘制提示信息
-        instruction1 = self.font.render("左键点击棋盘放置骷髅", True, self.BLACK)
-        instruction2 = self.font.render("右键点击棋盘清除骷髅", True, self.BLACK)
-        self.screen.blit(instruction1, (30, self.BOARD_SIZE + 40))
-        self.screen.blit(instruction2, (30, self.BOARD_SIZE + 70))
-
-        # 绘制信息栏
         self.draw_info_panel()
 
-
-        if self.solving:
-            solving_text = self.font.render("正在计算中...", True, self.RED)
-            self.screen.blit(solving_text, (self.WIDTH // 2 - solving_text.get_width() // 2,
-                                                self.BOARD_SIZE + 110))
-
     def draw_skull_selector(self):
-        """绘制骷髅类型选择器"""
+        """绘制骷髅类型选项和当前选中的高亮框（边框和标题在背景中），返回选项区域"""
         skull_area = pygame.Rect(self.BOARD_SIZE + 60, 10, 320, 120)  # 调整大小
-        pygame.draw.rect(self.screen, self.GRAY, skull_area, 2, 10)
-
-        selector_title = self.font.render("选择骷髅类型:", True, self.BLACK)
-        self.screen.blit(selector_title, (skull_area.x + 15, skull_area.y + 15))
+        options_rect = pygame.Rect(skull_area.x + 15, skull_area.y + 40, 290, 86)
+        self.restore_background(options_rect)
 
         skull_options = [
             ("White Skull (1HP)", WHITE_SKULL),
@@ -507,10 +424,9 @@ class BoardEditor:
             if self.current_skull_type == sk_type:
                 pygame.draw.rect(self.screen, self.BLUE, option_rect, 3, 4)
 
-            # 绘制骷髅示例
-            if sk_type in self.skull_images:
-                img = pygame.transform.scale(self.skull_images[sk_type], (20, 20))
-                self.screen.blit(img, (option_rect.x + 5, option_rect.y))
+            # 绘制骷髅示例（缩小的图像在初始化时缓存）
+            if sk_type in self.skull_icons:
+                self.screen.blit(self.skull_icons[sk_type], (option_rect.x + 5, option_rect.y))
             else:
                 pygame.draw.circle(self.screen,
                                    self.SKULL_COLORS[sk_type],
@@ -518,82 +434,65 @@ class BoardEditor:
                                    10)
 
             # 绘制文字
-            text = self.font.render(name, True, self.BLACK)
-            self.screen.blit(text, (option_rect.x + 30, option_rect.y))
+            self.screen.blit(self.render_text(name), (option_rect.x + 30, option_rect.y))
+        return options_rect
 
     def draw_piece_editor(self):
-        """绘制棋子数量编辑器"""
+        """绘制各种棋子的当前数量（其余部分在背景中），返回数量所在的一列"""
         pieces_area = pygame.Rect(self.BOARD_SIZE + 60, 140, 320, 280)  # 增加区域大小
-        pygame.draw.rect(self.screen, self.GRAY, pieces_area, 0, 10)
+        counts_rect = pygame.Rect(pieces_area.x + 170, pieces_area.y + 50, 50, len(self.PIECE_ROWS) * 35)
 
-        # 标题
-        pieces_title = self.font.render("可用棋子数量:", True, self.BLACK)
-        self.screen.blit(pieces_title, (pieces_area.x + 15, pieces_area.y + 15))
-
-        # 各个棋子的数量编辑
-        piece_types = [
-            ("Queen", QUEEN),
-            ("Rook", ROOK),
-            ("Bishop", BISHOP),
-            ("Knight", KNIGHT),
-            ("King", KING),
-            ("Pawn", PAWN)
-        ]
-
-        for i, (name, piece_type) in enumerate(piece_types):
-            # 绘制行背景
+        for i, (name, piece_type) in enumerate(self.PIECE_ROWS):
             row_rect = pygame.Rect(pieces_area.x + 20, pieces_area.y + 50 + i * 35, 280, 30)  # 增加行高
-            pygame.draw.rect(self.screen, self.WHITE, row_rect, 0, 5)
-
-            # 绘制棋子图像
-            if piece_type in self.piece_images:
-                img = self.piece_images[piece_type]
-                self.screen.blit(img, (row_rect.x + 10, row_rect.y + 3))
-
-            # 绘制棋子名称
-            text = self.font.render(name, True, self.BLACK)
-            self.screen.blit(text, (row_rect.x + 40, row_rect.y + 5))
-
-            # 绘制当前数量
-            count_text = self.font.render(str(self.available_pieces[piece_type]), True, self.BLACK)
+            count_rect = pygame.Rect(row_rect.x + 150, row_rect.y, 50, 34)
+            self.restore_background(count_rect)
+            count_text = self.render_text(str(self.available_pieces[piece_type]))
             self.screen.blit(count_text, (row_rect.x + 160, row_rect.y + 5))
-
-            # 减少按钮
-            minus_rect = pygame.Rect(row_rect.x + 200, row_rect.y + 3, 25, 25)
-            pygame.draw.rect(self.screen, self.RED, minus_rect, 0, 5)
-            minus_text = self.font.render("-", True, self.WHITE)
-            self.screen.blit(minus_text, (minus_rect.x + 8, minus_rect.y + 1))
-
-            # 增加按钮
-            plus_rect = pygame.Rect(row_rect.x + 240, row_rect.y + 3, 25, 25)
-            pygame.draw.rect(self.screen, self.GREEN, plus_rect, 0, 5)
-            plus_text = self.font.render("+", True, self.WHITE)
-            self.screen.blit(plus_text, (plus_rect.x + 7, plus_rect.y - 1))
+        return counts_rect
 
     def draw_action_buttons(self):
-        """绘制操作按钮"""
+        """绘制操作按钮和“正在计算中”的提示，返回它们所在的区域"""
         # 计算按钮位置
         buttons_x = 450 + (self.WIDTH - 400 - 200) // 2
         buttons_y = 430
+        actions_rect = pygame.Rect(30, buttons_y, buttons_x + 100 - 30, 35)
+        self.restore_background(actions_rect)
+
+        # 热力图开关
+        heatmap_button = pygame.Rect(30, buttons_y, 110, 30)
+        pygame.draw.rect(self.screen, (255, 235, 150) if self.heatmap is not None else (240, 240, 240),
+                         heatmap_button, 0, 5)
+        pygame.draw.rect(self.screen, (200, 200, 200), heatmap_button, 2, 5)
+        heatmap_text = self.render_text("隐藏热力图" if self.heatmap is not None else "显示热力图")
+        self.screen.blit(heatmap_text, (heatmap_button.centerx - heatmap_text.get_width() // 2,
+                                        heatmap_button.centery - heatmap_text.get_height() // 2))
 
         clear_button = pygame.Rect(buttons_x - 100, buttons_y, 80, 30)
         pygame.draw.rect(self.screen, (240, 240, 240), clear_button, 0, 5)
         pygame.draw.rect(self.screen, (200, 200, 200), clear_button, 2, 5)
-        clear_text = self.font.render("清空棋盘", True, self.BLACK)
+        clear_text = self.render_text("清空棋盘")
         self.screen.blit(clear_text, (clear_button.centerx - clear_text.get_width() // 2,
                                       clear_button.centery - clear_text.get_height() // 2))
 
+        # 求解过程中同一个按钮用于取消
         solve_button = pygame.Rect(buttons_x + 20, buttons_y, 80, 30)
-        button_color = (100, 200, 100) if not self.solving else (200, 200, 200)
+        button_color = (100, 200, 100) if not self.solving else (230, 150, 150)
         pygame.draw.rect(self.screen, button_color, solve_button, 0, 5)
         pygame.draw.rect(self.screen, (100, 150, 100), solve_button, 2, 5)
-        solve_text = self.font.render("开始计算", True, self.BLACK)
+        solve_text = self.render_text("取消计算" if self.solving else "开始计算")
         self.screen.blit(solve_text, (solve_button.centerx - solve_text.get_width() // 2,
                                       solve_button.centery - solve_text.get_height() // 2))
 
+        if self.solving:
+            solving_text = self.render_text("正在计算中...", self.RED)
+            self.screen.blit(solving_text, (self.WIDTH // 2 - solving_text.get_width() // 2,
+                                            self.BOARD_SIZE + 110))
+
         # 存储按钮位置供点击检测
         self.clear_button_rect = clear_button
         self.solve_button_rect = solve_button
+        self.heatmap_button_rect = heatmap_button
+        return actions_rect
 
     def handle_mouse_click(self, pos, is_right_click=False):
         """处理鼠标点击"""
@@ -608,6 +507,9 @@ class BoardEditor:
                 self.board_data[row, col] = 0
             else:  # 左键点击放置骷髅
                 self.board_data[row, col] = self.current_skull_type
+            self.invalidate_cell(row, col)
+            if self.heatmap is not None:
+                self.invalidate_squares(self.heatmap.set_cell(row, col, self.board_data[row, col]))
             return
 
         # 检查是否点击了骷髅类型选择器
@@ -617,14 +519,13 @@ class BoardEditor:
                 option_rect = pygame.Rect(skull_area.x + 20, skull_area.y + 45 + i * 25, 280, 20)
                 if option_rect.collidepoint(x, y):
                     self.current_skull_type = sk_type
+                    self.invalidate("selector")
                     return
 
         # 检查是否点击了棋子数量编辑按钮
         pieces_area = pygame.Rect(self.BOARD_SIZE + 60, 140, 320, 280)
         if pieces_area.collidepoint(x, y):
-            piece_types = [QUEEN, ROOK, BISHOP, KNIGHT, KING, PAWN]
-
-            for i, piece_type in enumerate(piece_types):
+            for i, (_, piece_type) in enumerate(self.PIECE_ROWS):
                 row_rect = pygame.Rect(pieces_area.x + 20, pieces_area.y + 50 + i * 35, 280, 30)
 
                 if row_rect.collidepoint(x, y):
@@ -632,30 +533,74 @@ class BoardEditor:
                     minus_rect = pygame.Rect(row_rect.x + 200, row_rect.y + 3, 25, 25)
                     if minus_rect.collidepoint(x, y) and self.available_pieces[piece_type] > 0:
                         self.available_pieces[piece_type] -= 1
+                        self.invalidate("pieces")
+                        if self.heatmap is not None:
+                            self.invalidate_squares(self.heatmap.set_pieces(self.available_pieces))
                         return
 
                     # 增加按钮
                     plus_rect = pygame.Rect(row_rect.x + 240, row_rect.y + 3, 25, 25)
                     if plus_rect.collidepoint(x, y):
                         self.available_pieces[piece_type] += 1
+                        self.invalidate("pieces")
+                        if self.heatmap is not None:
+                            self.invalidate_squares(self.heatmap.set_pieces(self.available_pieces))
                         return
 
+        # 检查是否点击了信息栏的统计切换按钮
+        if getattr(self, 'stats_button_rect', None) is not None and self.stats_button_rect.collidepoint(x, y):
+            self.show_stats = not self.show_stats
+            self.invalidate("info")
+            return
+
         # 检查是否点击了操作按钮
         if hasattr(self, 'clear_button_rect') and self.clear_button_rect.collidepoint(x, y):
             # 清除棋盘
             self.board_data = np.zeros((8, 8), dtype=int)
+            if self.heatmap is not None:
+                self.heatmap = DamageHeatmap(self.board_data, self.available_pieces)
+            self.invalidate("board")
             return False
 
-            # 检查是否点击了解算按钮
-        if hasattr(self, 'solve_button_rect') and self.solve_button_rect.collidepoint(x, y) and not self.solving:
-                    return self.start_solving()
+        # 检查是否点击了热力图开关
+        if getattr(self, 'heatmap_button_rect', None) is not None and self.heatmap_button_rect.collidepoint(x, y):
+            self.toggle_heatmap()
+            return
+
+            # 检查是否点击了解算按钮（求解过程中为取消按钮）
+        if hasattr(self, 'solve_button_rect') and self.solve_button_rect.collidepoint(x, y):
+            if self.solving:
+                if self.monitor is not None:
+                    self.monitor.cancel()
+                return None
+            return self.start_solving()
 
     def start_solving(self):
         """开始求解棋盘"""
-        self.solving = True
         self.solution = None
         self.solution_message = ""
 
+        # 启动求解线程前先做毫秒级的可行性检查，必然无解的棋盘立即给出原因
+        if np.any(self.board_data > 0):
+            reasons = check_feasibility(self.board_data, self.available_pieces)
+            if reasons:
+                self.solution_message = "无解"
+                self.info_messages = ["该棋盘必然无解，原因如下："] + reasons
+                return None
+
+        # 缓存命中时立即显示；已证明最优则无需再求解，否则在后台继续求解以升级缓存
+        cached = self.solution_cache.get(self.board_data, self.available_pieces)
+        if cached is not None:
+            self.display_solution(cached.solution, cached.optimal)
+            self.info_messages.insert(0, "（来自缓存）")
+            if cached.optimal:
+                return None
+
+        self.solving = True
+        self.progress = None
+        self.stats = None
+        self.monitor = monitor = SolveMonitor()
+
         # 使用线程运行计算，避免界面卡顿
         def solve_thread():
             try:
@@ -677,8 +622,28 @@ class BoardEditor:
                     self.solving = False
                     return
 
-                # 调用求解函数
-                solution = beam_search_solution(board, available_pieces)
+                # 调用求解函数：束搜索给出初始解，精确搜索在时间预算内证明或改进它；
+                # 在规范朝向上求解，旋转或镜像过的相同棋盘直接复用结果；互不影响的分量并行求解。
+                # 求解以迭代器的形式进行，进度经自定义事件通知主循环显示，取消后得到目前最好的解
+                exact_solver = functools.partial(exact_search_solution, time_budget=5.0)
+                solver = functools.partial(solve_canonical,
+                                           solver=functools.partial(decomposed_solution, solver=exact_solver),
+                                           cache=self.solution_cache, use_cached=False)
+                if self.profile_path:
+                    solver = profile_solver(solver, self.profile_path)
+                result = None
+                last_post = 0.0
+                for update in iter_solve(board, available_pieces, solver, monitor):
+                    result = update.result
+                    if monitor is not self.monitor:
+                        continue  # 已开始新的求解，这次的进度不再显示
+                    self.progress = update
+                    # 进度很频繁，限制唤醒主循环的频率，中间的进度由下一次唤醒时一并显示
+                    now = time.time()
+                    if now - last_post >= self.PROGRESS_INTERVAL:
+                        last_post = now
+                        pygame.event.post(pygame.event.Event(self.SOLVE_PROGRESS))
+                solution = result.solution
 
                 # 输出详细的解决方案到控制台
                 if solution:
@@ -690,7 +655,11 @@ class BoardEditor:
 
                 # 更新UI以显示结果
                 self.solution = solution
-                self.display_solution(solution)
+                self.stats = result.stats
+                self.display_solution(solution, result.optimal)
+                if result.mode == "cancelled":
+                    self.solution_message = "已取消"
+                    self.info_messages.insert(0, "（计算已取消，显示目前最好的解）")
             except Exception as e:
                 self.solution_message = f"求解出错: {str(e)}"
                 print(f"求解错误: {e}")
@@ -698,6 +667,7 @@ class BoardEditor:
                 traceback.print_exc()
             finally:
                 self.solving = False
+                pygame.event.post(pygame.event.Event(self.SOLVE_DONE))
 
         # 启动求解线程
         thread = threading.Thread(target=solve_thread)
@@ -706,52 +676,75 @@ class BoardEditor:
 
         return None
 
+    def panel_state(self):
+        """信息栏和按钮所显示的状态，用于判断是否需要重画"""
+        return (self.solving, self.progress, self.solution_message, tuple(self.info_messages), self.show_stats,
+                self.stats)
+
     def run(self):
-        """运行编辑器主循环"""
-        clock = pygame.time.Clock()
+        """运行编辑器主循环
+
+        主循环在没有输入和求解通知时休眠（pygame.event.wait），只在状态变化时重画，
+        空闲时几乎不占用CPU，也不与求解线程争抢GIL。
+        """
         running = True
 
-        while running:
-            # 清屏
-            self.screen.fill(self.WHITE)
+        # 鼠标移动事件用不到，屏蔽后移动鼠标不会唤醒主循环
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
+
+        # 第一帧完整绘制，之后只重画变化的分区
+        self.draw_ui()
+        pygame.display.flip()
+        shown = self.panel_state()
 
-            # 绘制界面
-            self.draw_board()
-            self.draw_ui()
+        while running:
+            # 等待输入或求解线程的事件；超时只是保险，状态没有变化时不会重画
+            events = [pygame.event.wait(500)] + pygame.event.get()
 
-            # 事件处理
-            for event in pygame.event.get():
+            # 事件处理（求解在后台线程中进行，求解过程中同样响应鼠标）
+            for event in events:
                 if event.type == pygame.QUIT:
                     running = False
                     return None
 
-                if not self.solving:  # 只有在非求解状态下才处理鼠标事件
-                    if event.type == pygame.MOUSEBUTTONDOWN:
-                        # 左键点击
-                        if event.button == 1:
-                            result = self.handle_mouse_click(event.pos)
-                            if result is not None and result != False:
-                                return result
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    # 左键点击
+                    if event.button == 1:
+                        result = self.handle_mouse_click(event.pos)
+                        if result is not None and result != False:
+                            return result
+
+                    # 右键点击
+                    elif event.button == 3:
+                        self.handle_mouse_click(event.pos, True)
+
+                # 窗口被遮挡后重新露出时完整重绘
+                elif event.type == pygame.WINDOWEXPOSED:
+                    self.draw_ui()
+                    pygame.display.flip()
 
-                        # 右键点击
-                        elif event.button == 3:
-                            self.handle_mouse_click(event.pos, True)
+            # 求解线程修改的状态（进度、结果、求解中标志）变化时重画信息栏和按钮
+            state = self.panel_state()
+            if state != shown:
+                shown = state
+                self.invalidate("info", "actions")
 
-            # 更新屏幕
-            pygame.display.flip()
-            clock.tick(30)
+            # 只更新变化的区域
+            self.render()
 
         pygame.quit()
         return None
 
-    def display_solution(self, solution):
-        """显示求解结果"""
+    def display_solution(self, solution, optimal=None):
+        """显示求解结果，optimal 表示结果是否已被证明最优（或已证明无解）"""
         self.solution = solution
         self.info_messages = []
 
         if solution:
             self.solution_message = f"找到解决方案！使用了 {len(solution)} 个棋子"
             self.info_messages.append(f"总计使用 {len(solution)} 个棋子消灭所有骷髅")
+            if optimal is not None:
+                self.info_messages.append("已证明棋子数最少" if optimal else "未能在时间内证明最优")
             self.info_messages.append("具体步骤如下：")
             self.info_messages.append("")
 
@@ -762,6 +755,8 @@ class BoardEditor:
         else:
             self.solution_message = "未找到解决方案"
             self.info_messages.append("无法找到有效解决方案")
+            if optimal is not None:
+                self.info_messages.append("已证明无解" if optimal else "搜索预算用尽，未能证明无解")
             self.info_messages.append("请尝试增加可用棋子数量或调整棋盘")
 
 
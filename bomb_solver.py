@@ -0,0 +1,2894 @@
+"""Chess Bomb 求解核心：棋盘状态、攻击范围和各种求解算法，不依赖 pygame"""
+import numpy as np
+import contextlib
+import functools
+import hashlib
+import heapq
+import json
+import math
+import os
+import queue
+import random
+import time
+import threading
+from collections import OrderedDict
+
+# 定义骷髅类型
+WHITE_SKULL = 1
+GRAY_SKULL = 2
+BOSS_SKULL = 3
+
+# 定义棋子类型
+PAWN = 'P'
+KNIGHT = 'N'
+BISHOP = 'B'
+ROOK = 'R'
+QUEEN = 'Q'
+KING = 'K'
+
+# 棋子中文名称
+PIECE_NAMES = {
+    PAWN: "兵",
+    KNIGHT: "马",
+    BISHOP: "象",
+    ROOK: "车",
+    QUEEN: "皇后",
+    KING: "王"
+}
+
+
+def precalculate_attack_patterns():
+    """预计算每种棋子在每个位置的攻击范围"""
+    attack_patterns = {}
+
+    # 为每种棋子类型计算攻击模式
+    for piece_type in [PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING]:
+        attack_patterns[piece_type] = {}
+        for x in range(8):
+            for y in range(8):
+                affected_cells = set()
+
+                if piece_type == PAWN:
+                    # 兵攻击十字形
+                    for dx, dy in [(0, 1), (0, 2), (0, -1), (0, -2), (1, 0), (2, 0), (-1, 0), (-2, 0)]:
+                        nx, ny = x + dx, y + dy
+                        if 0 <= nx < 8 and 0 <= ny < 8:
+                            affected_cells.add((nx, ny))
+
+                elif piece_type == KNIGHT:
+                    # 马的日字型移动
+                    knight_moves = [
+                        (-2, -1), (-2, 1), (-1, -2), (-1, 2),
+                        (1, -2), (1, 2), (2, -1), (2, 1)
+                    ]
+                    for dx, dy in knight_moves:
+                        nx, ny = x + dx, y + dy
+                        if 0 <= nx < 8 and 0 <= ny < 8:
+                            affected_cells.add((nx, ny))
+
+                elif piece_type == BISHOP:
+                    # 象攻击对角线
+                    for dx, dy in [(1, 1), (1, -1), (-1, 1), (-1, -1)]:
+                        nx, ny = x, y
+                        while True:
+                            nx += dx
+                            ny += dy
+                            if 0 <= nx < 8 and 0 <= ny < 8:
+                                affected_cells.add((nx, ny))
+                            else:
+                                break
+
+                elif piece_type == ROOK:
+                    # 车攻击同行同列
+                    for i in range(8):
+                        if i != x:
+                            affected_cells.add((i, y))
+                        if i != y:
+                            affected_cells.add((x, i))
+
+                elif piece_type == QUEEN:
+                    # 皇后攻击同行、同列和对角线
+                    # 同行同列
+                    for i in range(8):
+                        if i != x:
+                            affected_cells.add((i, y))
+                        if i != y:
+                            affected_cells.add((x, i))
+
+                    # 对角线
+                    for dx, dy in [(1, 1), (1, -1), (-1, 1), (-1, -1)]:
+                        nx, ny = x, y
+                        while True:
+                            nx += dx
+                            ny += dy
+                            if 0 <= nx < 8 and 0 <= ny < 8:
+                                affected_cells.add((nx, ny))
+                            else:
+                                break
+
+                elif piece_type == KING:
+                    # 王攻击周围8个位置
+                    for dx in [-1, 0, 1]:
+                        for dy in [-1, 0, 1]:
+                            if dx == 0 and dy == 0:
+                                continue
+                            nx, ny = x + dx, y + dy
+                            if 0 <= nx < 8 and 0 <= ny < 8:
+                                affected_cells.add((nx, ny))
+
+                attack_patterns[piece_type][(x, y)] = affected_cells
+
+    return attack_patterns
+
+
+def precalculate_attack_tensor(attack_patterns):
+    """将攻击范围转换为 (6, 64, 64) 的稠密张量，tensor[p, s, t] 表示棋子p在s处能否攻击t"""
+    tensor = np.zeros((len(PIECE_TYPES), 64, 64), dtype=np.float32)  # float32 以便矩阵乘法使用BLAS
+    for p, piece_type in enumerate(PIECE_TYPES):
+        for (x, y), affected_cells in attack_patterns[piece_type].items():
+            for i, j in affected_cells:
+                tensor[p, x * 8 + y, i * 8 + j] = 1
+    return tensor
+
+
+# 棋子类型的固定顺序
+PIECE_TYPES = [PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING]
+FULL_MASK = (1 << 64) - 1
+
+# 预计算的攻击张量按位打包保存在模块旁边，导入时直接读取，不必运行上面的Python循环。
+# 文件中同时保存规则版本和打包数据的校验和：修改 precalculate_attack_patterns 中的规则后把版本加1，
+# 旧文件就不再被使用，导入时在内存中重新计算；运行 python bomb_solver.py 重新生成文件。
+ATTACK_RULES_VERSION = 1
+ATTACK_TABLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "attack_tables.npz")
+
+
+def pack_attack_tensor(tensor):
+    return np.packbits(tensor.astype(bool), axis=-1, bitorder="little")
+
+
+def load_attack_tensor(path=ATTACK_TABLES_PATH):
+    """读取预计算的攻击张量；文件缺失、损坏或规则版本不符时在内存中重新计算（不写回文件）"""
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            packed = data["tables"]
+            valid = (int(data["version"]) == ATTACK_RULES_VERSION
+                     and packed.shape == (len(PIECE_TYPES), 64, 8) and packed.dtype == np.uint8
+                     and str(data["checksum"]) == hashlib.sha256(packed.tobytes()).hexdigest())
+        if valid:
+            return np.unpackbits(packed, axis=-1, bitorder="little").astype(np.float32)
+    except (OSError, ValueError, KeyError):
+        pass
+    return precalculate_attack_tensor(precalculate_attack_patterns())
+
+
+def save_attack_tables(path=ATTACK_TABLES_PATH):
+    """按当前规则重新计算攻击张量，连同规则版本和校验和写入文件"""
+    packed = pack_attack_tensor(precalculate_attack_tensor(precalculate_attack_patterns()))
+    np.savez(path, tables=packed, version=np.array(ATTACK_RULES_VERSION),
+             checksum=np.array(hashlib.sha256(packed.tobytes()).hexdigest()))
+
+
+def tensor_to_masks(tensor):
+    """由攻击张量得到每种棋子在每个位置的64位整数掩码"""
+    packed = pack_attack_tensor(tensor)
+    return {piece_type: [int.from_bytes(row.tobytes(), "little") for row in packed[p]]
+            for p, piece_type in enumerate(PIECE_TYPES)}
+
+
+@functools.lru_cache(maxsize=None)
+def attack_patterns():
+    """按需生成 {棋子: {(x, y): 攻击格子集合}} 形式的攻击范围，只有逐格计算的 ChessState 需要"""
+    return {piece_type: {(s // 8, s % 8): {(t // 8, t % 8) for t in np.flatnonzero(ATTACK_TENSOR[p, s])}
+                         for s in range(64)}
+            for p, piece_type in enumerate(PIECE_TYPES)}
+
+
+def __getattr__(name):
+    # 兼容旧代码中的 ATTACK_PATTERNS 全局变量，首次访问时才生成
+    if name == "ATTACK_PATTERNS":
+        return attack_patterns()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# 全局变量，用于缓存攻击模式
+ATTACK_TENSOR = load_attack_tensor()
+ATTACK_MASKS = tensor_to_masks(ATTACK_TENSOR)
+ATTACK_MATRIX = ATTACK_TENSOR.reshape(len(PIECE_TYPES) * 64, 64)  # 每行对应一个 (棋子, 位置) 移动
+
+# 与 moves.sort(reverse=True) 相同的并列排序：效率 > 棋子字母 > x > y
+_PIECE_SORT_RANK = np.array([sorted(PIECE_TYPES).index(p) for p in PIECE_TYPES], dtype=np.int64)
+MOVE_TIEBREAK = (_PIECE_SORT_RANK[:, None] * 64 + np.arange(64)[None, :]).ravel()
+
+# Zobrist 哈希表：每个格子的每种取值 (-1 已放置棋子, 0 空, 1~3 生命值) 以及每种棋子的每个数量各对应一个随机数。
+# 棋盘只有64格，超过64的棋子数量与64等价，因此数量按64截断。
+ZOBRIST_MAX_COUNT = 64
+_zobrist_rng = random.Random(20240601)  # 标准库随机数即可，不必为此加载 numpy.random
+
+
+def _zobrist_keys(rows, columns):
+    return [[_zobrist_rng.getrandbits(63) << 1 for _ in range(columns)] for _ in range(rows)]
+
+
+_ZOBRIST_BOARD_KEYS = _zobrist_keys(64, 5)
+_ZOBRIST_INVENTORY_ROWS = _zobrist_keys(len(PIECE_TYPES), ZOBRIST_MAX_COUNT + 1)
+_ZOBRIST_PLACEMENT_KEYS = _zobrist_keys(len(PIECE_TYPES), 64)  # 放置集合的哈希
+ZOBRIST_BOARD = np.array(_ZOBRIST_BOARD_KEYS, dtype=np.uint64)
+ZOBRIST_INVENTORY = np.array(_ZOBRIST_INVENTORY_ROWS, dtype=np.uint64)
+ZOBRIST_PLACEMENT = np.array(_ZOBRIST_PLACEMENT_KEYS, dtype=np.uint64)
+_ZOBRIST_INVENTORY_KEYS = dict(zip(PIECE_TYPES, _ZOBRIST_INVENTORY_ROWS))
+
+
+def zobrist_inventory_key(piece_type, count):
+    """某种棋子剩余count个时的Zobrist键"""
+    return _ZOBRIST_INVENTORY_KEYS[piece_type][min(count, ZOBRIST_MAX_COUNT)]
+
+
+def zobrist_hash(board, available_pieces):
+    """计算棋盘和棋子数量的完整Zobrist哈希"""
+    h = 0
+    for index, value in enumerate(np.asarray(board).ravel()):
+        h ^= _ZOBRIST_BOARD_KEYS[index][int(value) + 1]
+    for piece_type in PIECE_TYPES:
+        h ^= zobrist_inventory_key(piece_type, available_pieces.get(piece_type, 0))
+    return h
+
+
+class TranspositionTable:
+    """有容量上限的置换表，超出容量时淘汰最久未使用的条目（LRU）"""
+
+    def __init__(self, capacity=1 << 16):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def lookup(self, key):
+        """查找条目，命中时将其标记为最近使用"""
+        value = self.entries.get(key)
+        if value is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def store(self, key, value):
+        """写入条目，必要时淘汰最久未使用的条目"""
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def check_and_store(self, key, value):
+        """若key已存在则返回True（重复状态），否则记录并返回False"""
+        if self.lookup(key) is not None:
+            return True
+        self.store(key, value)
+        return False
+
+
+def precalculate_symmetries():
+    """计算棋盘的8种二面体对称变换，返回 (8, 64) 数组，perm[k][i] 为格子i在第k种变换下的位置"""
+    transforms = [
+        lambda x, y: (x, y),  # 恒等
+        lambda x, y: (y, 7 - x),  # 旋转90度
+        lambda x, y: (7 - x, 7 - y),  # 旋转180度
+        lambda x, y: (7 - y, x),  # 旋转270度
+        lambda x, y: (x, 7 - y),  # 左右翻转
+        lambda x, y: (7 - x, y),  # 上下翻转
+        lambda x, y: (y, x),  # 主对角线翻转
+        lambda x, y: (7 - y, 7 - x),  # 副对角线翻转
+    ]
+    permutations = np.zeros((len(transforms), 64), dtype=np.int64)
+    for k, transform in enumerate(transforms):
+        for x in range(8):
+            for y in range(8):
+                nx, ny = transform(x, y)
+                permutations[k, x * 8 + y] = nx * 8 + ny
+    return permutations
+
+
+# 所有棋子的攻击范围在这8种变换下都保持不变，因此对称的棋盘有对称的解
+SYMMETRY_PERMUTATIONS = precalculate_symmetries()
+SYMMETRY_INVERSE = [
+    next(j for j in range(len(SYMMETRY_PERMUTATIONS))
+         if np.array_equal(SYMMETRY_PERMUTATIONS[j][SYMMETRY_PERMUTATIONS[k]], np.arange(64)))
+    for k in range(len(SYMMETRY_PERMUTATIONS))
+]
+
+
+def transform_board(board, k):
+    """对棋盘施加第k种对称变换"""
+    flat = np.asarray(board).ravel()
+    transformed = np.empty_like(flat)
+    transformed[SYMMETRY_PERMUTATIONS[k]] = flat
+    return transformed.reshape(8, 8)
+
+
+def transform_solution(solution, k):
+    """对解中的每一步施加第k种对称变换"""
+    if solution is None:
+        return None
+    transformed = []
+    for piece_type, x, y in solution:
+        index = int(SYMMETRY_PERMUTATIONS[k][x * 8 + y])
+        transformed.append((piece_type, index // 8, index % 8))
+    return transformed
+
+
+def board_symmetries(board):
+    """返回使棋盘保持不变的对称变换序号（总是包含恒等变换0）"""
+    board = np.asarray(board)
+    return [k for k in range(len(SYMMETRY_PERMUTATIONS)) if np.array_equal(transform_board(board, k), board)]
+
+
+def canonicalize_board(board):
+    """把棋盘变换到规范朝向（8种朝向中字节序最小的一个）
+
+    返回 (规范棋盘, k)，其中 k 为从原棋盘到规范棋盘的变换；
+    规范棋盘上的解用 transform_solution(solution, SYMMETRY_INVERSE[k]) 映射回原棋盘。
+    """
+    best = None
+    for k in range(len(SYMMETRY_PERMUTATIONS)):
+        transformed = transform_board(board, k)
+        encoded = transformed.astype(np.int8).tobytes()
+        if best is None or encoded < best[0]:
+            best = (encoded, transformed, k)
+    return best[1], best[2]
+
+
+def canonical_key(board, available_pieces):
+    """谜题的规范编码：旋转或镜像后的相同谜题得到相同的键"""
+    canonical, _ = canonicalize_board(board)
+    counts = bytes(min(available_pieces.get(piece_type, 0), ZOBRIST_MAX_COUNT) for piece_type in PIECE_TYPES)
+    return canonical.astype(np.int8).tobytes() + counts
+
+
+def symmetric_zobrist(flat_board, available_pieces, symmetries):
+    """在给定的对称变换下取最小的Zobrist哈希，互为对称的状态得到相同的值"""
+    permutations = SYMMETRY_PERMUTATIONS[symmetries]
+    values = np.asarray(flat_board, dtype=np.int64)[None, :] + 1
+    board_keys = np.bitwise_xor.reduce(ZOBRIST_BOARD[permutations, values], axis=1)
+    h = int(board_keys.min())
+    for piece_type in PIECE_TYPES:
+        h ^= zobrist_inventory_key(piece_type, available_pieces.get(piece_type, 0))
+    return h
+
+
+def mask_to_vector(mask):
+    """将64位掩码转换为长度64的0/1向量"""
+    return np.unpackbits(np.frombuffer(mask.to_bytes(8, "little"), dtype=np.uint8), bitorder="little")
+
+
+def inventory_vector(available_pieces):
+    """将棋子数量字典转换为按 PIECE_TYPES 排列的数组"""
+    return np.array([available_pieces.get(piece_type, 0) for piece_type in PIECE_TYPES], dtype=np.int64)
+
+
+def move_damage_matrix(alive, empty, inventory):
+    """一次矩阵乘法计算所有 (棋子, 位置) 移动的伤害
+
+    alive、empty 为长度64的向量，inventory 为长度6的棋子数量。
+    返回 (6, 64) 的整数矩阵，不能放置的移动记为 -1。
+    """
+    damage = (ATTACK_MATRIX @ np.asarray(alive, dtype=np.float32)).astype(np.int64)
+    damage = damage.reshape(len(PIECE_TYPES), 64)
+    valid = np.asarray(empty, dtype=bool)[None, :] & (np.asarray(inventory) > 0)[:, None]
+    return np.where(valid, damage, -1)
+
+
+def damage_upper_bounds(alive, free, inventory):
+    """放置k个棋子最多能造成的总伤害的上界，返回数组 upper，upper[k-1] 对应k个棋子
+
+    free 为之后可能放置棋子的格子（空格和骷髅格）。骷髅被消灭只会让伤害变小，
+    因此当前的伤害是之后每一步伤害的上界。取两种松弛的较小值：
+    每个格子只放一个棋子（按格子取最大伤害），以及每种棋子数量有限（每种棋子取伤害最大的若干格子）。
+    """
+    damage = np.maximum(move_damage_matrix(alive, free, inventory), 0)
+
+    by_square = np.cumsum(np.sort(damage.max(axis=0))[::-1])
+    ranked = -np.sort(-damage, axis=1)
+    by_piece = ranked[np.arange(64)[None, :] < np.asarray(inventory)[:, None]]
+    by_piece = np.cumsum(np.sort(by_piece)[::-1])
+
+    length = min(len(by_square), len(by_piece))
+    return np.minimum(by_square[:length], by_piece[:length])
+
+
+def square_name(x, y):
+    """格子的棋盘坐标名称，如 a8"""
+    return f"{chr(97 + y)}{8 - x}"
+
+
+def check_feasibility(board, available_pieces):
+    """在搜索前快速判断棋盘是否必然无解，返回无解原因的列表（为空表示未发现矛盾）
+
+    只做必要条件检查：
+    - 所有棋子造成的总伤害上界不少于骷髅总生命值；
+    - 每个骷髅能被攻击的次数上界（可攻击它的不同格子数，以及各棋子数量与可攻击格子数的较小值之和）
+      不少于它的生命值。
+    """
+    flat = np.asarray(board).ravel()
+    alive = flat > 0
+    free = flat >= 0  # 空格和骷髅格（骷髅被消灭后可以放置棋子）
+    inventory = inventory_vector(available_pieces)
+    health = int(np.maximum(flat, 0).sum())
+    reasons = []
+
+    upper = damage_upper_bounds(alive, free, inventory)
+    max_damage = int(upper[-1]) if len(upper) else 0
+    if max_damage < health:
+        reasons.append(f"所有棋子最多造成 {max_damage} 点伤害，少于骷髅总生命值 {health}")
+
+    # coverage[p, t]：棋子p能从多少个可放置格子攻击到t（攻击范围对称）
+    usable = inventory > 0
+    reach = ATTACK_TENSOR[usable][:, free, :] > 0
+    coverage = reach.sum(axis=1)
+    distinct = reach.any(axis=0).sum(axis=0)
+    max_hits = np.minimum(distinct, np.minimum(coverage, inventory[usable][:, None]).sum(axis=0))
+    for index in np.flatnonzero(alive & (max_hits < flat)):
+        x, y = divmod(int(index), 8)
+        reasons.append(f"{square_name(x, y)} 的骷髅有 {flat[index]} 点生命，最多只能被攻击 {max_hits[index]} 次")
+    return reasons
+
+
+def top_k_moves(alive, empty, inventory, k):
+    """返回伤害最高的k个移动 [(efficiency, piece_type, x, y), ...]，按效率从高到低排序"""
+    damage = move_damage_matrix(alive, empty, inventory).ravel()
+    candidates = np.flatnonzero(damage > 0)
+    if len(candidates) == 0:
+        return []
+
+    keys = damage[candidates] * 4096 + MOVE_TIEBREAK[candidates]
+    if len(candidates) > k:
+        part = np.argpartition(keys, -k)[-k:]
+        candidates, keys = candidates[part], keys[part]
+    order = np.argsort(-keys)
+
+    moves = []
+    for flat in candidates[order]:
+        p, square = divmod(int(flat), 64)
+        moves.append((int(damage[flat]), PIECE_TYPES[p], square // 8, square % 8))
+    return moves
+
+
+class DamageHeatmap:
+    """编辑棋盘时，每个空格子上能造成的最大伤害以及造成它的棋子
+
+    damage[p, s] 为在格子s放置第p种棋子能攻击到的存活骷髅数（即 ATTACK_MATRIX 与存活向量之积）。
+    一个格子的骷髅出现或消失时，只需加减攻击张量中攻击该格子的那一列，并只为受影响的格子重新挑选最好的棋子；
+    棋子数量变化时只需重新挑选。并列时的选择与 top_k_moves 相同。
+    """
+
+    def __init__(self, board, available_pieces):
+        self.board = np.array(board, dtype=int).ravel()
+        alive = (self.board > 0).astype(np.float32)
+        self.damage = (ATTACK_MATRIX @ alive).astype(np.int64).reshape(len(PIECE_TYPES), 64)
+        self.usable = inventory_vector(available_pieces) > 0
+        self.best_damage = np.full(64, -1, dtype=np.int64)  # 非空格子或没有可用棋子时为 -1
+        self.best_piece = np.full(64, -1, dtype=np.int64)  # PIECE_TYPES 中的序号
+        self.refresh(np.arange(64))
+
+    def refresh(self, squares):
+        """为 squares 中的格子重新挑选伤害最大的棋子，返回结果有变化的格子序号"""
+        damage = self.damage[:, squares]
+        keys = np.where(self.usable[:, None], damage * 4096 + MOVE_TIEBREAK.reshape(len(PIECE_TYPES), 64)[:, squares],
+                        -1)
+        best = keys.argmax(axis=0)
+        valid = (self.board[squares] == 0) & self.usable.any()
+        best_piece = np.where(valid, best, -1)
+        best_damage = np.where(valid, damage[best, np.arange(len(squares))], -1)
+        changed = (best_piece != self.best_piece[squares]) | (best_damage != self.best_damage[squares])
+        self.best_piece[squares] = best_piece
+        self.best_damage[squares] = best_damage
+        return np.asarray(squares)[changed]
+
+    def set_cell(self, x, y, value):
+        """修改一个格子（骷髅生命值，0 为空格），返回显示结果有变化的格子序号"""
+        index = x * 8 + y
+        old = self.board[index]
+        if old == value:
+            return np.zeros(0, dtype=np.int64)
+        self.board[index] = value
+        squares = np.array([index])
+        delta = int(value > 0) - int(old > 0)
+        if delta:
+            column = ATTACK_TENSOR[:, :, index].astype(np.int64)  # 各移动是否攻击到该格子
+            self.damage += delta * column
+            squares = np.flatnonzero(column.any(axis=0) | (np.arange(64) == index))
+        return self.refresh(squares)
+
+    def set_pieces(self, available_pieces):
+        """棋子数量变化，返回显示结果有变化的格子序号"""
+        usable = inventory_vector(available_pieces) > 0
+        if np.array_equal(usable, self.usable):
+            return np.zeros(0, dtype=np.int64)
+        self.usable = usable
+        return self.refresh(np.arange(64))
+
+    def best_move(self, x, y):
+        """格子(x, y)上伤害最大的 (棋子, 伤害)，不能放置或没有伤害时返回 None"""
+        index = x * 8 + y
+        if self.best_damage[index] <= 0:
+            return None
+        return PIECE_TYPES[self.best_piece[index]], int(self.best_damage[index])
+
+
+def vector_to_mask(vector):
+    """将长度64的0/1向量转换为64位掩码"""
+    return int.from_bytes(np.packbits(np.asarray(vector, dtype=bool), bitorder="little").tobytes(), "little")
+
+
+def precalculate_dominating_pieces(attack_masks):
+    """找出在每个位置攻击范围都包含另一种棋子攻击范围的棋子（如皇后包含车、象、王）"""
+    dominating = {}
+    for piece_type in PIECE_TYPES:
+        dominating[piece_type] = [
+            other for other in PIECE_TYPES
+            if other != piece_type and all(mask & ~other_mask == 0 for mask, other_mask
+                                           in zip(attack_masks[piece_type], attack_masks[other]))
+        ]
+    return dominating
+
+
+DOMINATING_PIECES = precalculate_dominating_pieces(ATTACK_MASKS)
+_DOMINATING_PIECE_INDICES = [[PIECE_TYPES.index(other) for other in DOMINATING_PIECES[piece_type]]
+                             for piece_type in PIECE_TYPES]
+
+
+class PruningCounters:
+    """支配剪枝的计数器"""
+
+    def __init__(self):
+        self.examined = 0  # 参与剪枝的移动数
+        self.subset = 0  # 同种棋子、命中集合被其他格子包含而剪除的移动数
+        self.upgrade = 0  # 同一格子可换成攻击范围更大的棋子而剪除的移动数
+
+    @property
+    def removed(self):
+        return self.subset + self.upgrade
+
+
+class SearchStats:
+    """一次求解的结构化统计，随 SolveResult 返回
+
+    计数：generated 生成的后继状态数，expanded 扩展的状态（节点）数，pruned 剪除的被支配移动数，
+    duplicates 因重复而丢弃的状态数，copies 复制状态的次数，moves_scored 评分并排序过的候选移动数。
+    timers 按阶段累计用时（秒），束搜索中分为生成移动、复制状态和排序三部分，其余求解方式按各自的阶段计时；
+    depths 为束搜索每一层的健康状况：束宽、候选数以及束中最好、最差和平均的剩余生命值。
+    """
+
+    COUNTERS = ("generated", "expanded", "pruned", "duplicates", "copies", "moves_scored")
+    PHASE_NAMES = {"move_generation": "生成移动", "copying": "复制状态", "sorting": "排序",
+                   "exact": "精确搜索", "expansion": "展开节点", "rollouts": "随机模拟"}
+
+    def __init__(self):
+        self.generated = 0
+        self.expanded = 0
+        self.pruned = 0
+        self.duplicates = 0
+        self.copies = 0
+        self.moves_scored = 0
+        self.timers = {}
+        self.depths = []
+        self.elapsed = 0.0
+        self.profile_path = None  # 用 profile_solver 运行时，性能分析结果的文件
+
+    def lap(self, phase, since):
+        """把从 since（time.perf_counter()）到现在的用时计入 phase，返回当前时刻，便于接着计时下一段"""
+        now = time.perf_counter()
+        self.timers[phase] = self.timers.get(phase, 0.0) + now - since
+        return now
+
+    def record_depth(self, depth, candidates, health):
+        """记录束搜索一层的健康状况，health 为新束中各状态的剩余生命值"""
+        health = [int(value) for value in health]
+        if health:
+            self.depths.append({"depth": depth, "width": len(health), "candidates": candidates,
+                                "best": min(health), "worst": max(health),
+                                "mean": round(sum(health) / len(health), 2)})
+
+    def merge(self, other):
+        """把另一份统计（如并行分片或分量的统计）累加到这一份"""
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for phase, seconds in other.timers.items():
+            self.timers[phase] = self.timers.get(phase, 0.0) + seconds
+        self.depths.extend(other.depths)
+        return self
+
+    def as_dict(self):
+        """转换为可以写入JSON的字典"""
+        record = {name: getattr(self, name) for name in self.COUNTERS}
+        record.update(timers={phase: round(seconds, 4) for phase, seconds in self.timers.items()},
+                      depths=self.depths, elapsed=round(self.elapsed, 4))
+        if self.profile_path is not None:
+            record["profile"] = self.profile_path
+        return record
+
+    def summary_lines(self):
+        """适合在界面中逐行显示的统计摘要"""
+        lines = [f"生成状态：{self.generated}，扩展：{self.expanded}，复制：{self.copies}",
+                 f"评分移动：{self.moves_scored}，剪除被支配移动：{self.pruned}，重复状态：{self.duplicates}"]
+        if self.timers:
+            lines.append("用时：" + "，".join(f"{self.PHASE_NAMES.get(phase, phase)} {seconds:.2f}秒"
+                                            for phase, seconds in self.timers.items()))
+        if self.depths:
+            last = self.depths[-1]
+            lines.append(f"束搜索 {len(self.depths)} 层，最后一层束宽 {last['width']}，"
+                         f"剩余生命值 {last['best']}~{last['worst']}（平均 {last['mean']}）")
+        total = f"总用时：{self.elapsed:.2f}秒"
+        if self.profile_path is not None:
+            total += f"，性能分析：{self.profile_path}"
+        lines.append(total)
+        return lines
+
+
+def profile_solver(solver, path, sort="cumulative", limit=40):
+    """包装求解函数，使其在 cProfile 下运行
+
+    结束后把原始数据写入 path（可用 pstats 或 snakeviz 打开），按 sort 排序的前 limit 行文本报告写入 path + ".txt"。
+    只分析调用线程，进程池中的子问题不在其中。
+    """
+    @functools.wraps(solver)
+    def profiled(*args, **kwargs):
+        import cProfile  # 延迟导入，只在需要性能分析时加载
+        import pstats
+        profiler = cProfile.Profile()
+        try:
+            result = profiler.runcall(solver, *args, **kwargs)
+        finally:
+            profiler.dump_stats(path)
+            with open(path + ".txt", "w", encoding="utf-8") as f:
+                pstats.Stats(profiler, stream=f).sort_stats(sort).print_stats(limit)
+        if isinstance(result, SolveResult) and result.stats is not None:
+            result.stats.profile_path = path
+        return result
+
+    return profiled
+
+
+def prune_dominated_moves(moves, alive, counts, placements_left, counters=None, same_piece=True, limit=None):
+    """剪除被支配的移动，保持原有顺序
+
+    moves 为按效率从高到低排序的 [(efficiency, piece_type, x, y), ...]，alive 为存活骷髅掩码，counts 为棋子数量。
+    - 同一格子上，若另一种棋子的攻击范围包含它，且那种棋子数量不少于 placements_left
+      （之后最多还会放置的棋子数，因此总能换过去），则剪除；
+    - same_piece 为真时，同种棋子若在另一个空格子上命中的存活骷髅包含它的命中集合，则剪除
+      （命中集合相同时只保留第一个）。
+    limit 不为 None 时，保留够 limit 个移动后即停止。
+    """
+    plentiful = {piece_type for piece_type, count in counts.items() if count > 0 and count >= placements_left}
+    maximal = {}  # 每种棋子已保留移动的命中集合；输入按效率降序，支配者总是先出现
+    kept = []
+    examined = upgrade = subset = 0
+    for move in moves:
+        if limit is not None and len(kept) >= limit:
+            break
+        examined += 1
+        _, piece_type, x, y = move
+        if any(other in plentiful for other in DOMINATING_PIECES[piece_type]):
+            upgrade += 1
+            continue
+        if same_piece:
+            hits = ATTACK_MASKS[piece_type][x * 8 + y] & alive
+            group = maximal.setdefault(piece_type, [])
+            if any(hits & ~other == 0 for other in group):
+                subset += 1
+                continue
+            group.append(hits)
+        kept.append(move)
+
+    if counters is not None:
+        counters.examined += examined
+        counters.upgrade += upgrade
+        counters.subset += subset
+    return kept
+
+
+class ChessState:
+    def __init__(self, board, available_pieces=None):
+        self.board = np.array(board, dtype=int)  # 棋盘状态（副本，不修改调用者的棋盘）
+        self.bombs_used = []  # 已使用棋子的列表
+        if available_pieces is None:
+            self.available_pieces = {
+                PAWN: 0,
+                KNIGHT: 0,
+                BISHOP: 0,
+                ROOK: 0,
+                QUEEN: 0,
+                KING: 0
+            }
+        else:
+            self.available_pieces = available_pieces.copy()  # 使用副本避免修改原始数据
+        self.zobrist = zobrist_hash(self.board, self.available_pieces)  # 棋盘和棋子数量的哈希，随移动增量更新
+
+    def copy(self):
+        new_state = ChessState.__new__(ChessState)
+        new_state.board = np.copy(self.board)
+        new_state.available_pieces = self.available_pieces.copy()
+        new_state.bombs_used = self.bombs_used.copy()
+        new_state.zobrist = self.zobrist
+        return new_state
+
+    def get_affected_cells(self, piece_type, x, y):
+        """获取特定棋子在位置(x, y)能攻击到的所有位置"""
+        return attack_patterns()[piece_type][(x, y)]
+
+    def place_piece(self, piece_type, x, y):
+        """放置棋子并攻击骷髅"""
+        if self.board[x][y] != 0 or self.available_pieces[piece_type] <= 0:
+            return None
+
+        new_state = self.copy()
+        new_state.board[x][y] = -1  # 标记为已放置棋子
+        count = self.available_pieces[piece_type]
+        new_state.available_pieces[piece_type] = count - 1
+        new_state.bombs_used.append((piece_type, x, y))
+        h = new_state.zobrist
+        h ^= _ZOBRIST_BOARD_KEYS[x * 8 + y][1] ^ _ZOBRIST_BOARD_KEYS[x * 8 + y][0]
+        h ^= zobrist_inventory_key(piece_type, count) ^ zobrist_inventory_key(piece_type, count - 1)
+
+        # 获取受影响的单元格
+        affected_cells = self.get_affected_cells(piece_type, x, y)
+
+        # 应用伤害
+        for i, j in affected_cells:
+            value = new_state.board[i][j]
+            if value > 0:
+                new_state.board[i][j] = value - 1
+                keys = _ZOBRIST_BOARD_KEYS[i * 8 + j]
+                h ^= keys[value + 1] ^ keys[value]
+
+        new_state.zobrist = h
+        return new_state
+
+    def is_solved(self):
+        """检查是否所有骷髅都被消灭"""
+        return np.all(self.board <= 0)
+
+    def remaining_health(self):
+        """返回剩余的骷髅总生命值"""
+        return np.sum(np.maximum(self.board, 0))
+
+    def calculate_piece_efficiency(self, piece_type, x, y):
+        """计算在某个位置放置棋子能消灭的生命值总和"""
+        if self.board[x][y] != 0 or self.available_pieces[piece_type] <= 0:
+            return -1  # 不能在非空格子放置棋子或没有可用棋子
+
+        damage = 0
+        affected_cells = self.get_affected_cells(piece_type, x, y)
+
+        # 计算伤害
+        for i, j in affected_cells:
+            if self.board[i][j] > 0:
+                damage += 1
+
+        return damage
+
+    def generate_moves(self):
+        """列出所有伤害大于0的移动 (efficiency, piece_type, x, y)"""
+        moves = []
+        for x in range(8):
+            for y in range(8):
+                if self.board[x][y] == 0:  # 只能在空格子放置
+                    for piece_type in self.available_pieces.keys():
+                        if self.available_pieces[piece_type] <= 0:
+                            continue  # 没有可用的该类型棋子
+
+                        efficiency = self.calculate_piece_efficiency(piece_type, x, y)
+                        if efficiency > 0:
+                            moves.append((efficiency, piece_type, x, y))
+        return moves
+
+    def top_moves(self, k):
+        """用向量化内核直接取出效率最高的k个移动"""
+        flat = self.board.ravel()
+        return top_k_moves(flat > 0, flat == 0, inventory_vector(self.available_pieces), k)
+
+    def alive_mask(self):
+        """存活骷髅的64位掩码"""
+        return vector_to_mask(self.board.ravel() > 0)
+
+    def board_vector(self):
+        """长度64的棋盘向量"""
+        return self.board.ravel()
+
+
+class BitboardState:
+    """用位棋盘表示的棋盘状态
+
+    layers[k] 记录生命值至少为 k+1 的骷髅，occupied 记录已放置棋子的格子，
+    放置棋子和造成伤害都只需要几次位运算。
+    """
+
+    def __init__(self, board=None, available_pieces=None):
+        self.layers = [0, 0, 0]  # 生命值 >=1, >=2, >=3 的骷髅
+        self.occupied = 0  # 已放置棋子的格子
+        self.bombs_used = []  # 已使用棋子的列表
+        self.undo_stack = []  # apply 的撤销信息 (被命中的存活骷髅掩码, 之前的哈希)，与 bombs_used 末尾对应
+        if available_pieces is None:
+            self.available_pieces = {piece_type: 0 for piece_type in PIECE_TYPES}
+        else:
+            self.available_pieces = available_pieces.copy()
+
+        if board is not None:
+            for x in range(8):
+                for y in range(8):
+                    value = int(board[x][y])
+                    bit = 1 << (x * 8 + y)
+                    if value < 0:
+                        self.occupied |= bit
+                    for k in range(min(value, 3)):
+                        self.layers[k] |= bit
+        self.zobrist = zobrist_hash(self.board, self.available_pieces)
+
+    @property
+    def board(self):
+        """还原为8x8数组形式的棋盘"""
+        board = np.zeros((8, 8), dtype=int)
+        for index in range(64):
+            bit = 1 << index
+            if self.occupied & bit:
+                board[index // 8, index % 8] = -1
+            else:
+                board[index // 8, index % 8] = sum(1 for layer in self.layers if layer & bit)
+        return board
+
+    def copy(self):
+        new_state = BitboardState.__new__(BitboardState)
+        new_state.layers = self.layers.copy()
+        new_state.occupied = self.occupied
+        new_state.bombs_used = self.bombs_used.copy()
+        new_state.undo_stack = []
+        new_state.available_pieces = self.available_pieces.copy()
+        new_state.zobrist = self.zobrist
+        return new_state
+
+    def empty_mask(self):
+        """可放置棋子的空格子掩码"""
+        return ~(self.layers[0] | self.occupied) & FULL_MASK
+
+    def place_piece(self, piece_type, x, y):
+        """放置棋子并攻击骷髅"""
+        bit = 1 << (x * 8 + y)
+        if not self.empty_mask() & bit or self.available_pieces[piece_type] <= 0:
+            return None
+
+        new_state = self.copy()
+        new_state.occupied |= bit
+        count = self.available_pieces[piece_type]
+        new_state.available_pieces[piece_type] = count - 1
+        new_state.bombs_used.append((piece_type, x, y))
+
+        # 被攻击的格子生命值减1：第k层保留未被攻击的部分，并由第k+1层补上被攻击的部分
+        attack = ATTACK_MASKS[piece_type][x * 8 + y]
+        l1, l2, l3 = self.layers
+        new_state.layers = [(l1 & ~attack) | (l2 & attack),
+                            (l2 & ~attack) | (l3 & attack),
+                            l3 & ~attack]
+
+        # 增量更新哈希：只处理被放置的格子、被攻击的骷髅和棋子数量
+        h = self.zobrist
+        h ^= _ZOBRIST_BOARD_KEYS[x * 8 + y][1] ^ _ZOBRIST_BOARD_KEYS[x * 8 + y][0]
+        h ^= zobrist_inventory_key(piece_type, count) ^ zobrist_inventory_key(piece_type, count - 1)
+        hit = attack & l1
+        while hit:
+            low = hit & -hit
+            hit ^= low
+            value = 1 + bool(l2 & low) + bool(l3 & low)
+            keys = _ZOBRIST_BOARD_KEYS[low.bit_length() - 1]
+            h ^= keys[value + 1] ^ keys[value]
+        new_state.zobrist = h
+
+        return new_state
+
+    def apply(self, piece_type, x, y):
+        """原地放置棋子，不能放置时返回False
+
+        供深度优先的搜索使用：不复制状态，撤销所需的信息只有两个整数，压入 undo_stack，由 undo 恢复。
+        """
+        index = x * 8 + y
+        bit = 1 << index
+        count = self.available_pieces[piece_type]
+        if not self.empty_mask() & bit or count <= 0:
+            return False
+
+        attack = ATTACK_MASKS[piece_type][index]
+        l1, l2, l3 = self.layers
+        hit = attack & l1
+        self.undo_stack.append((hit, self.zobrist))
+        self.bombs_used.append((piece_type, x, y))
+        self.occupied |= bit
+        self.available_pieces[piece_type] = count - 1
+        self.layers[0] = (l1 & ~attack) | (l2 & attack)
+        self.layers[1] = (l2 & ~attack) | (l3 & attack)
+        self.layers[2] = l3 & ~attack
+
+        h = self.zobrist
+        h ^= _ZOBRIST_BOARD_KEYS[index][1] ^ _ZOBRIST_BOARD_KEYS[index][0]
+        h ^= zobrist_inventory_key(piece_type, count) ^ zobrist_inventory_key(piece_type, count - 1)
+        while hit:
+            low = hit & -hit
+            hit ^= low
+            value = 1 + bool(l2 & low) + bool(l3 & low)
+            keys = _ZOBRIST_BOARD_KEYS[low.bit_length() - 1]
+            h ^= keys[value + 1] ^ keys[value]
+        self.zobrist = h
+        return True
+
+    def undo(self):
+        """撤销最近一次 apply，返回被撤销的移动"""
+        piece_type, x, y = move = self.bombs_used.pop()
+        hit, self.zobrist = self.undo_stack.pop()
+        index = x * 8 + y
+        attack = ATTACK_MASKS[piece_type][index]
+        # 被攻击的格子上，原来的第k+1层就是现在的第k层，原来的第1层就是被命中的存活骷髅
+        l1, l2, l3 = self.layers
+        self.layers[0] = (l1 & ~attack) | hit
+        self.layers[1] = (l2 & ~attack) | (l1 & attack)
+        self.layers[2] = (l3 & ~attack) | (l2 & attack)
+        self.occupied &= ~(1 << index)
+        self.available_pieces[piece_type] += 1
+        return move
+
+    def is_solved(self):
+        """检查是否所有骷髅都被消灭"""
+        return self.layers[0] == 0
+
+    def remaining_health(self):
+        """返回剩余的骷髅总生命值"""
+        return sum(layer.bit_count() for layer in self.layers)
+
+    def calculate_piece_efficiency(self, piece_type, x, y):
+        """计算在某个位置放置棋子能消灭的生命值总和"""
+        index = x * 8 + y
+        if not self.empty_mask() >> index & 1 or self.available_pieces[piece_type] <= 0:
+            return -1
+
+        return (ATTACK_MASKS[piece_type][index] & self.layers[0]).bit_count()
+
+    def generate_moves(self):
+        """列出所有伤害大于0的移动 (efficiency, piece_type, x, y)"""
+        moves = []
+        alive = self.layers[0]
+        if not alive:
+            return moves
+
+        empty = self.empty_mask()
+        piece_masks = [(piece_type, ATTACK_MASKS[piece_type])
+                       for piece_type, count in self.available_pieces.items() if count > 0]
+        while empty:
+            low = empty & -empty
+            index = low.bit_length() - 1
+            empty ^= low
+            x, y = divmod(index, 8)
+            for piece_type, masks in piece_masks:
+                efficiency = (masks[index] & alive).bit_count()
+                if efficiency > 0:
+                    moves.append((efficiency, piece_type, x, y))
+        return moves
+
+    def top_moves(self, k):
+        """取出效率最高的k个移动"""
+        return heapq.nlargest(k, self.generate_moves())
+
+    def alive_mask(self):
+        """存活骷髅的64位掩码"""
+        return self.layers[0]
+
+    def board_vector(self):
+        """长度64的棋盘向量"""
+        vector = mask_to_vector(self.layers[0]).astype(np.int64)
+        vector += mask_to_vector(self.layers[1])
+        vector += mask_to_vector(self.layers[2])
+        vector -= mask_to_vector(self.occupied)
+        return vector
+
+
+# CompactState 把整个状态打包进一个整数，各字段的起始位：
+# 生命值低位、高位和已放置棋子各占64位；棋子数量每种占7位（数量超过64时与64等价）；
+# 其后是64位的Zobrist哈希和到达该状态的移动编号（棋子序号 << 6 | 位置）
+_INVENTORY_BITS = 7
+_INVENTORY_FIELD = (1 << _INVENTORY_BITS) - 1
+_HIGH_SHIFT = 64
+_OCCUPIED_SHIFT = 128
+_INVENTORY_SHIFT = 192
+_ZOBRIST_SHIFT = _INVENTORY_SHIFT + len(PIECE_TYPES) * _INVENTORY_BITS
+_MOVE_SHIFT = _ZOBRIST_SHIFT + 64
+_STATE_MASK = (1 << _ZOBRIST_SHIFT) - 1  # 棋盘和棋子数量部分，相等的状态在这部分相同
+
+
+class CompactState:
+    """内存紧凑、可哈希的棋盘状态，用于很宽的束
+
+    整个状态打包在一个整数 bits 中：生命值按位切片存成低位和高位两个64位字段（每格共2位），另有已放置棋子的格子、
+    棋子数量、Zobrist 哈希和到达该状态的移动，各字段的位置见上面的常量。parent 指向父状态，
+    已放置的棋子沿父状态链还原，兄弟状态共享父状态而不复制历史。每个状态只有一个对象和一个整数，
+    子状态约130字节（分别存放各字段时约280字节）。相等的状态（棋盘和棋子数量相同）哈希相同。
+    """
+
+    __slots__ = ("bits", "parent")
+
+    def __init__(self, board=None, available_pieces=None):
+        low = high = occupied = inventory = 0
+        if available_pieces is not None:
+            for p, piece_type in enumerate(PIECE_TYPES):
+                count = min(available_pieces.get(piece_type, 0), ZOBRIST_MAX_COUNT)
+                inventory |= count << (p * _INVENTORY_BITS)
+        if board is not None:
+            for index, value in enumerate(np.asarray(board).ravel()):
+                value = int(value)
+                if value < 0:
+                    occupied |= 1 << index
+                elif value > 0:
+                    low |= (value & 1) << index
+                    high |= (value >> 1 & 1) << index
+        self.parent = None
+        self.bits = low | high << _HIGH_SHIFT | occupied << _OCCUPIED_SHIFT | inventory << _INVENTORY_SHIFT
+        self.bits |= zobrist_hash(self.board_vector(), self.available_pieces) << _ZOBRIST_SHIFT
+
+    def __eq__(self, other):
+        return isinstance(other, CompactState) and self.bits & _STATE_MASK == other.bits & _STATE_MASK
+
+    def __hash__(self):
+        return hash(self.zobrist)
+
+    @property
+    def low(self):
+        return self.bits & FULL_MASK
+
+    @property
+    def high(self):
+        return self.bits >> _HIGH_SHIFT & FULL_MASK
+
+    @property
+    def occupied(self):
+        return self.bits >> _OCCUPIED_SHIFT & FULL_MASK
+
+    @property
+    def zobrist(self):
+        return self.bits >> _ZOBRIST_SHIFT & FULL_MASK
+
+    def count(self, p):
+        """第p种棋子的剩余数量"""
+        return self.bits >> (_INVENTORY_SHIFT + p * _INVENTORY_BITS) & _INVENTORY_FIELD
+
+    @property
+    def available_pieces(self):
+        return {piece_type: self.count(p) for p, piece_type in enumerate(PIECE_TYPES)}
+
+    @property
+    def bombs_used(self):
+        """沿父状态链还原已放置的棋子"""
+        moves = []
+        node = self
+        while node.parent is not None:
+            code = node.bits >> _MOVE_SHIFT
+            moves.append((PIECE_TYPES[code >> 6], (code & 63) // 8, code % 8))
+            node = node.parent
+        moves.reverse()
+        return moves
+
+    @bombs_used.setter
+    def bombs_used(self, moves):
+        # 用只记录移动的占位状态组成父状态链，最后一个移动记在本状态上
+        codes = [PIECE_TYPES.index(piece_type) << 6 | x * 8 + y for piece_type, x, y in moves]
+        self.bits &= (1 << _MOVE_SHIFT) - 1
+        self.parent = None
+        if not codes:
+            return
+        parent = CompactState.__new__(CompactState)
+        parent.bits, parent.parent = 0, None  # 链的起点，不记录移动
+        for code in codes[:-1]:
+            node = CompactState.__new__(CompactState)
+            node.bits, node.parent = code << _MOVE_SHIFT, parent
+            parent = node
+        self.bits |= codes[-1] << _MOVE_SHIFT
+        self.parent = parent
+
+    @property
+    def board(self):
+        return self.board_vector().reshape(8, 8)
+
+    def copy(self):
+        new_state = CompactState.__new__(CompactState)
+        new_state.bits = self.bits
+        new_state.parent = self.parent
+        return new_state
+
+    def alive_mask(self):
+        """存活骷髅的64位掩码"""
+        bits = self.bits
+        return (bits | bits >> _HIGH_SHIFT) & FULL_MASK
+
+    def empty_mask(self):
+        """可放置棋子的空格子掩码"""
+        bits = self.bits
+        return ~(bits | bits >> _HIGH_SHIFT | bits >> _OCCUPIED_SHIFT) & FULL_MASK
+
+    def place_piece(self, piece_type, x, y):
+        """放置棋子并攻击骷髅，返回以本状态为父状态的新状态"""
+        index = x * 8 + y
+        p = PIECE_TYPES.index(piece_type)
+        count = self.count(p)
+        if not self.empty_mask() >> index & 1 or count <= 0:
+            return None
+
+        # 被命中的存活骷髅生命值减1：低位取反，低位原为0时向高位借位
+        bits = self.bits
+        low, high = bits & FULL_MASK, bits >> _HIGH_SHIFT & FULL_MASK
+        attack_hit = hit = ATTACK_MASKS[piece_type][index] & (low | high)
+
+        h = bits >> _ZOBRIST_SHIFT & FULL_MASK
+        h ^= _ZOBRIST_BOARD_KEYS[index][1] ^ _ZOBRIST_BOARD_KEYS[index][0]
+        h ^= zobrist_inventory_key(piece_type, count) ^ zobrist_inventory_key(piece_type, count - 1)
+        while hit:
+            bit = hit & -hit
+            hit ^= bit
+            value = bool(low & bit) + 2 * bool(high & bit)
+            keys = _ZOBRIST_BOARD_KEYS[bit.bit_length() - 1]
+            h ^= keys[value + 1] ^ keys[value]
+
+        new_state = CompactState.__new__(CompactState)
+        new_state.bits = ((bits & _STATE_MASK ^ attack_hit ^ (attack_hit & ~low) << _HIGH_SHIFT
+                           | 1 << (_OCCUPIED_SHIFT + index))
+                          - (1 << (_INVENTORY_SHIFT + p * _INVENTORY_BITS))
+                          | h << _ZOBRIST_SHIFT | (p << 6 | index) << _MOVE_SHIFT)
+        new_state.parent = self
+        return new_state
+
+    def is_solved(self):
+        """检查是否所有骷髅都被消灭"""
+        return not self.alive_mask()
+
+    def remaining_health(self):
+        """返回剩余的骷髅总生命值"""
+        bits = self.bits
+        return (bits & FULL_MASK).bit_count() + 2 * (bits >> _HIGH_SHIFT & FULL_MASK).bit_count()
+
+    def calculate_piece_efficiency(self, piece_type, x, y):
+        """计算在某个位置放置棋子能消灭的生命值总和"""
+        index = x * 8 + y
+        if not self.empty_mask() >> index & 1 or self.count(PIECE_TYPES.index(piece_type)) <= 0:
+            return -1
+        return (ATTACK_MASKS[piece_type][index] & self.alive_mask()).bit_count()
+
+    def generate_moves(self):
+        """列出所有伤害大于0的移动 (efficiency, piece_type, x, y)"""
+        moves = []
+        alive = self.alive_mask()
+        if not alive:
+            return moves
+
+        empty = self.empty_mask()
+        piece_masks = [(piece_type, ATTACK_MASKS[piece_type])
+                       for p, piece_type in enumerate(PIECE_TYPES) if self.count(p) > 0]
+        while empty:
+            bit = empty & -empty
+            index = bit.bit_length() - 1
+            empty ^= bit
+            x, y = divmod(index, 8)
+            for piece_type, masks in piece_masks:
+                efficiency = (masks[index] & alive).bit_count()
+                if efficiency > 0:
+                    moves.append((efficiency, piece_type, x, y))
+        return moves
+
+    def top_moves(self, k):
+        """取出效率最高的k个移动"""
+        return heapq.nlargest(k, self.generate_moves())
+
+    def board_vector(self):
+        """长度64的棋盘向量"""
+        vector = mask_to_vector(self.low).astype(np.int64)
+        vector += 2 * mask_to_vector(self.high)
+        vector -= mask_to_vector(self.occupied)
+        return vector
+
+
+# 可供束搜索选择的状态引擎
+STATE_ENGINES = {
+    "numpy": ChessState,
+    "bitboard": BitboardState,
+    "compact": CompactState,
+}
+
+
+class BeamFrontier:
+    """以结构化数组保存整个束
+
+    boards 为 (B, 64) 的棋盘，inventories 为 (B, 6) 的棋子数量，
+    parents 指向上一层束中的父状态，moves 记录到达该状态的 (棋子序号, 位置)。
+    不再为每个状态保存已使用棋子的列表，解由父指针回溯得到。
+    """
+
+    def __init__(self, boards, inventories, parents, moves):
+        self.boards = boards
+        self.inventories = inventories
+        self.parents = parents
+        self.moves = moves
+
+    @classmethod
+    def from_board(cls, board, available_pieces):
+        """由初始棋盘创建只含一个状态的束"""
+        boards = np.asarray(board, dtype=np.int8).reshape(1, 64).copy()
+        inventories = inventory_vector(available_pieces).reshape(1, len(PIECE_TYPES))
+        return cls(boards, inventories, np.full(1, -1, dtype=np.int64), np.full((1, 2), -1, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.boards)
+
+    def remaining_health(self):
+        """每个状态剩余的骷髅总生命值"""
+        return np.maximum(self.boards, 0).sum(axis=1, dtype=np.int64)
+
+    def take(self, indices):
+        """取出部分状态组成新的束"""
+        return BeamFrontier(self.boards[indices], self.inventories[indices],
+                            self.parents[indices], self.moves[indices])
+
+    def top_moves(self, k):
+        """批量为每个状态选出伤害最高的k个移动
+
+        返回 (父状态序号, 移动序号 p*64+s) 两个数组，移动序号对应 ATTACK_MATRIX 的行。
+        """
+        alive = (self.boards > 0).astype(np.float32)
+        damage = (alive @ ATTACK_MATRIX.T).astype(np.int64)  # (B, 6*64)
+        empty = self.boards == 0
+        valid = empty[:, None, :] & (self.inventories > 0)[:, :, None]
+        keys = np.where(valid.reshape(len(self), -1) & (damage > 0),
+                        damage * 4096 + MOVE_TIEBREAK[None, :], -1)
+
+        if k < keys.shape[1]:
+            columns = np.argpartition(keys, -k, axis=1)[:, -k:]
+        else:
+            columns = np.broadcast_to(np.arange(keys.shape[1]), keys.shape)
+        rows = np.broadcast_to(np.arange(len(self))[:, None], columns.shape)
+        chosen = keys[rows, columns] > 0
+        return rows[chosen], columns[chosen]
+
+    def expand(self, moves_per_state):
+        """批量生成所有子状态并施加伤害，返回子状态组成的束"""
+        parents, flat_moves = self.top_moves(moves_per_state)
+        piece_indices, squares = np.divmod(flat_moves, 64)
+
+        boards = self.boards[parents]
+        hits = ATTACK_MATRIX[flat_moves].astype(np.int8)
+        boards = boards - hits * (boards > 0)
+        boards[np.arange(len(boards)), squares] = -1  # 标记为已放置棋子
+
+        inventories = self.inventories[parents].copy()
+        inventories[np.arange(len(inventories)), piece_indices] -= 1
+
+        return BeamFrontier(boards, inventories, parents, np.stack([piece_indices, squares], axis=1))
+
+    def zobrist(self, symmetries=(0,)):
+        """批量计算每个状态的Zobrist哈希，与 zobrist_hash（多个对称变换时与 symmetric_zobrist）的结果一致"""
+        permutations = SYMMETRY_PERMUTATIONS[list(symmetries)]
+        values = self.boards.astype(np.int64) + 1
+        board_keys = ZOBRIST_BOARD[permutations[:, None, :], values[None, :, :]]
+        board_keys = np.bitwise_xor.reduce(board_keys, axis=2).min(axis=0)
+        counts = np.minimum(self.inventories, ZOBRIST_MAX_COUNT)
+        inventory_keys = ZOBRIST_INVENTORY[np.arange(len(PIECE_TYPES))[None, :], counts]
+        return board_keys ^ np.bitwise_xor.reduce(inventory_keys, axis=1)
+
+
+def reconstruct_bombs(layers, index):
+    """沿父指针从最后一层回溯，还原已使用棋子的列表"""
+    bombs_used = []
+    for frontier in reversed(layers):
+        piece_index, square = frontier.moves[index]
+        if piece_index < 0:
+            break
+        bombs_used.append((PIECE_TYPES[piece_index], int(square) // 8, int(square) % 8))
+        index = frontier.parents[index]
+    bombs_used.reverse()
+    return bombs_used
+
+
+# 求解函数
+# 每个工作进程至少分到这么多个状态才值得并行，束更小时在当前进程中扩展
+PARALLEL_MIN_SHARD = 8
+
+
+def pack_state(state):
+    """把状态压缩为 (棋盘字节, 各棋子剩余数量, 已放置棋子) 元组，便于在进程间传递"""
+    return (state.board_vector().astype(np.int8).tobytes(),
+            tuple(state.available_pieces[piece_type] for piece_type in PIECE_TYPES),
+            tuple(state.bombs_used))
+
+
+def unpack_state(state_class, packed):
+    """由 pack_state 的结果还原状态"""
+    board_bytes, counts, bombs_used = packed
+    board = np.frombuffer(board_bytes, dtype=np.int8).astype(int).reshape(8, 8)
+    state = state_class(board, dict(zip(PIECE_TYPES, counts)))
+    state.bombs_used = list(bombs_used)
+    return state
+
+
+def cached_top_moves(state, k, move_cache=None):
+    """state.top_moves(k)，move_cache 不为空时按状态的Zobrist哈希缓存
+
+    效率排序是全序，较长的结果的前缀就是较短的结果，因此缓存中已有至少k个移动（或全部移动）时直接截取。
+    """
+    if move_cache is None:
+        return state.top_moves(k)
+    cached = move_cache.lookup(state.zobrist)
+    if cached is not None and (cached[0] >= k or len(cached[1]) < cached[0]):
+        return cached[1][:k]
+    moves = state.top_moves(k)
+    move_cache.store(state.zobrist, (k, moves))
+    return moves
+
+
+def beam_moves(state, placements_left, prune_dominated, counters, limit=5, move_cache=None, stats=None):
+    """挑选束搜索中一个状态要扩展的（最多limit个）移动，已按效率从高到低排序
+
+    stats 为 SearchStats 时累计评分过的候选移动数。
+    """
+    if not prune_dominated:
+        moves = cached_top_moves(state, limit, move_cache)
+        if stats is not None:
+            stats.moves_scored += len(moves)
+        return moves
+    # 先取较多的候选移动剪枝，不够limit个时再取全部
+    alive = state.alive_mask()
+    fetch = max(40, 8 * limit)
+    moves = cached_top_moves(state, fetch, move_cache)
+    kept = prune_dominated_moves(moves, alive, state.available_pieces, placements_left, counters, limit=limit)
+    if len(kept) < limit and len(moves) == fetch:
+        moves = cached_top_moves(state, len(PIECE_TYPES) * 64, move_cache)
+        kept = prune_dominated_moves(moves, alive, state.available_pieces, placements_left, counters, limit=limit)
+    if stats is not None:
+        stats.moves_scored += len(moves)
+    return kept
+
+
+def beam_state_key(state, symmetries):
+    """束搜索去重用的键，棋盘有对称性时互为对称的状态得到相同的键"""
+    if len(symmetries) > 1:
+        return symmetric_zobrist(state.board_vector(), state.available_pieces, symmetries)
+    return state.zobrist
+
+
+def expand_beam_shard(engine, packed_states, placements_left, prune_dominated, symmetries, keep, moves_per_state=5):
+    """在工作进程中扩展束的一部分，返回本分片最好的keep个候选、剪枝计数和本分片的 SearchStats
+
+    候选为 (剩余生命值, 已用棋子数, 去重键, 压缩状态)，分片内部已去重，跨分片的重复由主进程的置换表处理。
+    """
+    state_class = STATE_ENGINES[engine]
+    counters = PruningCounters()
+    stats = SearchStats()
+    seen = set()
+    candidates = []
+    for packed in packed_states:
+        state = unpack_state(state_class, packed)
+        stats.expanded += 1
+        clock = time.perf_counter()
+        moves = beam_moves(state, placements_left, prune_dominated, counters, moves_per_state, stats=stats)
+        stats.lap("move_generation", clock)
+        for efficiency, piece_type, x, y in moves:
+            clock = time.perf_counter()
+            next_state = state.place_piece(piece_type, x, y)
+            stats.lap("copying", clock)
+            stats.copies += 1
+            if not next_state:
+                continue
+            stats.generated += 1
+            key = beam_state_key(next_state, symmetries)
+            if key in seen:
+                stats.duplicates += 1
+                continue
+            seen.add(key)
+            candidates.append((next_state.remaining_health(), len(next_state.bombs_used), len(candidates), key,
+                               next_state))
+    clock = time.perf_counter()
+    best = heapq.nsmallest(keep, candidates)
+    stats.lap("sorting", clock)
+    return ([(int(health), used, key, pack_state(state)) for health, used, _, key, state in best],
+            (counters.examined, counters.subset, counters.upgrade), stats)
+
+
+def beam_search_solution(initial_board, available_pieces, beam_width=10, max_depth=15, engine="numpy",
+                         transposition_size=1 << 16, prune_dominated=True, workers=1, monitor=None,
+                         moves_per_state=5, move_cache=None, deadline=None, stats=None):
+    """使用束搜索算法找到一个可行解
+
+    engine 选择状态实现："numpy" 使用8x8数组，"bitboard" 使用位棋盘，"compact" 使用内存紧凑的 CompactState，
+    "batched" 使用结构化数组的束并批量扩展（不做支配剪枝）。
+    transposition_size 为置换表容量，用于丢弃只是放置顺序不同的重复状态，为0时不去重。
+    prune_dominated 为真时，先剪除被支配的移动再挑选效率最高的移动。
+    workers 为扩展束时使用的进程数，None 表示CPU核数；束太小（每个进程分不到 PARALLEL_MIN_SHARD 个状态）时
+    仍在当前进程中顺序扩展。并行时每个进程只返回本分片最好的 beam_width 个候选，再由主进程合并。
+    monitor 为 SolveMonitor 时每一层汇报一次进度，并可在层与层之间取消。
+    moves_per_state 为每个状态最多扩展的移动数；move_cache 为跨多次搜索共享的 TranspositionTable，
+    缓存各状态的候选移动（只用于顺序扩展）；deadline 为 time.time() 形式的截止时间，超过后放弃搜索。
+    stats 为 SearchStats 时把计数、分阶段用时和每一层的束健康状况累加到其中。
+    """
+    if engine == "batched":
+        return batched_beam_search_solution(initial_board, available_pieces, beam_width, max_depth, moves_per_state,
+                                            deduplicate=transposition_size > 0, monitor=monitor, deadline=deadline,
+                                            stats=stats)
+
+    start_time = time.time()
+    if stats is None:
+        stats = SearchStats()
+    workers = workers or os.cpu_count() or 1
+
+    state_class = STATE_ENGINES[engine]
+    initial_state = state_class(initial_board, available_pieces)
+    beam = [initial_state]  # 当前束
+    table = TranspositionTable(transposition_size) if transposition_size > 0 else None
+    counters = PruningCounters()
+    symmetries = board_symmetries(initial_board)  # 棋盘自身的对称性：互为对称的状态只保留一个
+    executor = None  # 第一次需要并行时才创建进程池，之后各层复用
+    nodes = 0
+
+    try:
+        for depth in range(max_depth):
+            if not beam:
+                break
+
+            # 如果找到了解，直接返回
+            for state in beam:
+                if state.is_solved():
+                    print(f"束搜索在深度 {depth} 找到了解决方案，使用 {len(state.bombs_used)} 个棋子")
+                    return state.bombs_used
+
+            if deadline is not None and time.time() > deadline:
+                print(f"束搜索在深度 {depth} 超过时间预算")
+                return None
+
+            # 生成所有可能的下一步状态
+            candidates = []
+            shards = min(workers, len(beam) // PARALLEL_MIN_SHARD)
+            if shards > 1:
+                if executor is None:
+                    from concurrent.futures import ProcessPoolExecutor  # 延迟导入，顺序搜索时不必加载
+                    executor = ProcessPoolExecutor(max_workers=workers)
+                futures = [
+                    executor.submit(expand_beam_shard, engine, [pack_state(state) for state in beam[i::shards]],
+                                    max_depth - depth, prune_dominated, symmetries, beam_width, moves_per_state)
+                    for i in range(shards)
+                ]
+                for future in futures:
+                    shard_candidates, (examined, subset, upgrade), shard_stats = future.result()
+                    counters.examined += examined
+                    counters.subset += subset
+                    counters.upgrade += upgrade
+                    stats.merge(shard_stats)
+                    for health, used, key, packed in shard_candidates:
+                        # 不同分片可能生成相同的状态，只保留一个
+                        if table is not None and table.check_and_store(key, depth + 1):
+                            continue
+                        candidates.append((health, used, len(candidates), packed))
+                clock = time.perf_counter()
+                candidates.sort()
+                beam = [unpack_state(state_class, packed) for _, _, _, packed in candidates[:beam_width]]
+                stats.lap("sorting", clock)
+            else:
+                for state in beam:
+                    # 只考虑还有骷髅的状态
+                    if state.is_solved():
+                        continue
+                    if deadline is not None and time.time() > deadline:
+                        print(f"束搜索在深度 {depth} 超过时间预算")
+                        return None
+
+                    # 每个状态只扩展最好的 moves_per_state 个移动
+                    stats.expanded += 1
+                    clock = time.perf_counter()
+                    moves = beam_moves(state, max_depth - depth, prune_dominated, counters, moves_per_state,
+                                       move_cache, stats)
+                    stats.lap("move_generation", clock)
+                    for efficiency, piece_type, x, y in moves:
+                        clock = time.perf_counter()
+                        next_state = state.place_piece(piece_type, x, y)
+                        stats.lap("copying", clock)
+                        stats.copies += 1
+                        if next_state:
+                            stats.generated += 1
+                            # 放置顺序不同但结果相同的状态只保留一个
+                            if table is not None and table.check_and_store(beam_state_key(next_state, symmetries),
+                                                                           depth + 1):
+                                continue
+
+                            # 计算启发式评估值（剩余生命值越少越好）
+                            heuristic = next_state.remaining_health()
+                            candidates.append((heuristic, len(next_state.bombs_used), id(next_state), next_state))
+
+                # 按照启发式评估值排序，选择最好的几个状态作为新的束
+                clock = time.perf_counter()
+                candidates.sort()  # 现在sort会使用元组比较，先比较heuristic，再比较长度，最后比较id
+                beam = [state for _, _, _, state in candidates[:beam_width]]  # 保留最好的beam_width个状态
+                stats.lap("sorting", clock)
+
+            if not candidates:
+                return None
+            nodes += len(candidates)
+            stats.record_depth(depth + 1, len(candidates), [health for health, _, _, _ in candidates[:beam_width]])
+
+            # 打印进度
+            best_health = beam[0].remaining_health()
+            total_pieces = len(beam[0].bombs_used)
+            if monitor is not None:
+                monitor.checkpoint("束搜索", depth + 1, int(best_health), nodes,
+                                   beam[0].bombs_used if best_health == 0 else None)
+            elapsed = time.time() - start_time
+            duplicates = table.hits if table is not None else 0
+            print(
+                f"深度 {depth + 1}，最佳状态剩余生命值: {best_health}，已使用棋子: {total_pieces}，"
+                f"重复状态: {duplicates}，剪除被支配移动: {counters.removed}/{counters.examined}，"
+                f"并行分片: {max(shards, 1)}，用时: {elapsed:.2f}秒")
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        stats.pruned += counters.removed
+        stats.duplicates += table.hits if table is not None else 0
+        stats.elapsed += time.time() - start_time
+
+    # 检查最后的束中是否有解决方案
+    for state in beam:
+        if state.is_solved():
+            return state.bombs_used
+
+    return None
+
+
+def batched_beam_search_solution(initial_board, available_pieces, beam_width=10, max_depth=15, moves_per_state=5,
+                                 deduplicate=True, monitor=None, deadline=None, stats=None):
+    """束搜索的批量版本：整个束的扩展、伤害计算和评估都在NumPy中一次完成
+
+    同一状态只可能出现在同一深度（已放置棋子数相同），因此去重只需在每一层的候选中进行。
+    monitor 为 SolveMonitor 时每一层汇报一次进度，并可在层与层之间取消。
+    deadline 为 time.time() 形式的截止时间，每一层扩展前检查，超过后放弃搜索。
+    stats 为 SearchStats 时累加计数和分阶段用时（批量扩展计入生成移动，排序、去重和挑选计入排序）。
+    """
+    start_time = time.time()
+    nodes = 0
+    if stats is None:
+        stats = SearchStats()
+
+    beam = BeamFrontier.from_board(initial_board, available_pieces)
+    if beam.remaining_health()[0] == 0:
+        return []
+    layers = [beam]  # 每一层保留的束，用于回溯解
+    symmetries = board_symmetries(initial_board)
+
+    try:
+        for depth in range(max_depth):
+            if deadline is not None and time.time() > deadline:
+                print(f"束搜索在深度 {depth} 超过时间预算")
+                return None
+            stats.expanded += len(beam)
+            stats.moves_scored += len(beam) * len(PIECE_TYPES) * 64  # 批量扩展为每个状态的全部移动评分
+            clock = time.perf_counter()
+            candidates = beam.expand(moves_per_state)
+            clock = stats.lap("move_generation", clock)
+            if len(candidates) == 0:
+                return None
+            nodes += len(candidates)
+            stats.generated += len(candidates)
+            stats.copies += len(candidates)
+
+            # 按剩余生命值排序（稳定排序，保持生成顺序作为并列时的次序），保留最好的beam_width个状态
+            health = candidates.remaining_health()
+            order = np.argsort(health, kind="stable")
+            if deduplicate:
+                _, first = np.unique(candidates.zobrist(symmetries)[order], return_index=True)
+                stats.duplicates += len(order) - len(first)
+                order = order[np.sort(first)]
+            order = order[:beam_width]
+            beam = candidates.take(order)
+            layers.append(beam)
+            stats.lap("sorting", clock)
+            stats.record_depth(depth + 1, len(candidates), health[order])
+
+            best_health = int(health[order[0]])
+            if best_health == 0:
+                solution = reconstruct_bombs(layers, 0)
+                print(f"束搜索在深度 {depth + 1} 找到了解决方案，使用 {len(solution)} 个棋子")
+                if monitor is not None:
+                    monitor.checkpoint("束搜索", depth + 1, 0, nodes, solution)
+                return solution
+            if monitor is not None:
+                monitor.checkpoint("束搜索", depth + 1, best_health, nodes)
+
+            elapsed = time.time() - start_time
+            print(
+                f"深度 {depth + 1}，最佳状态剩余生命值: {best_health}，已使用棋子: {depth + 1}，束宽: {len(beam)}，用时: {elapsed:.2f}秒")
+    finally:
+        stats.elapsed += time.time() - start_time
+
+    return None
+
+
+class SolveResult:
+    """求解结果
+
+    solution 为放置步骤列表（无解时为 None），optimal 表示结果是否已被证明最优：
+    有解时表示棋子数最少，无解时表示已证明不存在解。mode 记录得到结果的求解方式，
+    stats 为求解过程的 SearchStats（求解方式不提供时为 None）。
+    """
+
+    def __init__(self, solution, optimal, nodes=0, elapsed=0.0, mode="exact", stats=None):
+        self.solution = solution
+        self.optimal = optimal
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.mode = mode
+        self.stats = stats
+
+
+class SearchBudgetExceeded(Exception):
+    """精确搜索用尽节点或时间预算"""
+
+
+class SolveCancelled(Exception):
+    """求解被取消"""
+
+
+class SolveProgress:
+    """求解过程中的一次进度汇报
+
+    depth 为束搜索的深度（精确搜索时为目前最好解的棋子数），best_health 为最好状态的剩余生命值，
+    nodes 为已展开的状态数，solution 为目前最好的完整解（可能为 None）。
+    done 为真表示求解结束，此时 result 为最终的 SolveResult。
+    """
+
+    def __init__(self, phase, depth=0, best_health=None, nodes=0, elapsed=0.0, solution=None, done=False,
+                 result=None):
+        self.phase = phase
+        self.depth = depth
+        self.best_health = best_health
+        self.nodes = nodes
+        self.elapsed = elapsed
+        self.solution = solution
+        self.done = done
+        self.result = result
+
+    @property
+    def nodes_per_second(self):
+        return self.nodes / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class SolveMonitor:
+    """在求解函数和调用者之间传递进度与取消请求
+
+    求解函数在每个扩展步骤调用 checkpoint 汇报进度，cancel 之后的下一次 checkpoint 抛出 SolveCancelled。
+    best 保存目前最好的完整解（已映射回原棋盘的朝向），可以在任意时刻读取。
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.cancelled = threading.Event()
+        self.start_time = time.time()
+        self.best = None
+        self.nodes = 0
+        self.orientation = 0  # 在规范朝向上求解时，汇报的解需要先施加的对称变换
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def checkpoint(self, phase, depth=0, best_health=None, nodes=None, solution=None):
+        """汇报进度；已请求取消时抛出 SolveCancelled"""
+        if self.cancelled.is_set():
+            raise SolveCancelled()
+        if nodes is not None:
+            self.nodes = nodes
+        if solution is not None and (self.best is None or len(solution) < len(self.best)):
+            self.best = transform_solution(list(solution), self.orientation)
+        if self.callback is not None:
+            self.callback(SolveProgress(phase, depth, best_health, self.nodes, time.time() - self.start_time,
+                                        self.best))
+
+
+def iterate_bits(mask):
+    """依次返回掩码中每个为1的位的序号"""
+    while mask:
+        low = mask & -mask
+        mask ^= low
+        yield low.bit_length() - 1
+
+
+class ExactSolver:
+    """求最少棋子数的精确分支定界搜索
+
+    放置顺序不影响总伤害，只影响“骷髅被消灭后格子才能放棋子”这一约束，
+    因此搜索在放置集合上进行：每一步选一个仍存活的骷髅，在所有可能攻击它的格子
+    （包括暂时还被骷髅占据的格子）上分支，任何解都必然包含其中之一，搜索是完备的。
+    找到能消灭所有骷髅的集合后再模拟出合法的放置顺序；若因循环阻挡排不出顺序，则包含它的任何解
+    都至少还攻击了某个仍存活（被阻挡）的骷髅，在攻击其中任意一个的所有移动上分支，搜索仍是完备的。
+    下界取以下两者的较大值：前k个最大可能伤害之和达到剩余生命值所需的k，以及单个骷髅的最大生命值。
+    """
+
+    def __init__(self, node_budget=2_000_000, time_budget=10.0, transposition_size=1 << 20, monitor=None):
+        self.node_budget = node_budget
+        self.time_budget = time_budget
+        self.transposition_size = transposition_size
+        self.monitor = monitor  # SolveMonitor，每展开1024个节点汇报一次进度
+        self.nodes = 0
+        self.best_solution = None
+        self.deadline = None
+        self.counters = PruningCounters()
+
+    def lower_bound(self, l1, l2, l3, chosen, counts):
+        """至少还需要放置的棋子数，不可能有解时返回 None"""
+        health = l1.bit_count() + l2.bit_count() + l3.bit_count()
+        max_health = 3 if l3 else 2 if l2 else 1
+
+        upper = damage_upper_bounds(mask_to_vector(l1), mask_to_vector(~chosen & FULL_MASK), counts)
+        if len(upper) == 0 or upper[-1] < health:
+            return None
+        return max(int(np.searchsorted(upper, health)) + 1, max_health)
+
+    def branch_moves(self, l1, l2, l3, chosen, targets, depth, blocked=False):
+        """在攻击目标骷髅的所有移动上分支，按伤害从高到低排序
+
+        从 targets 中选可攻击它的移动最少的骷髅；如果某个骷髅可用的格子数少于其生命值则返回 None。
+        blocked 为真时 targets 是循环阻挡中仍存活的骷髅：任何包含当前放置的解都至少再攻击其中一个
+        （但不一定是哪一个），因此在攻击其中任意一个的所有移动上分支，只有这些移动都不存在时才返回 None。
+        """
+        free = ~chosen & FULL_MASK
+        pieces = [(p, ATTACK_MASKS[piece_type]) for p, piece_type in enumerate(PIECE_TYPES) if self.counts[p] > 0]
+
+        if blocked:
+            squares = {p: 0 for p, _ in pieces}
+            for index in iterate_bits(targets):
+                for p, masks in pieces:
+                    squares[p] |= masks[index] & free
+            if not any(squares.values()):
+                return None
+        else:
+            target = None
+            target_count = None
+            for index in iterate_bits(targets):
+                covering = 0
+                count = 0
+                for _, masks in pieces:
+                    covering |= masks[index] & free
+                    count += (masks[index] & free).bit_count()
+                health = 1 + (l2 >> index & 1) + (l3 >> index & 1)
+                if covering.bit_count() < health:
+                    return None
+                if target_count is None or count < target_count:
+                    target, target_count = index, count
+            squares = {p: masks[target] & free for p, masks in pieces}
+
+        # 同一格子若能换成数量充足、攻击范围更大的棋子，则不必分支（只剪除这一类，保证最优性）
+        if self.best_solution is not None:
+            placements_left = len(self.best_solution) - depth - 1
+        else:
+            placements_left = sum(self.counts)
+        plentiful = [self.counts[p] > 0 and self.counts[p] >= placements_left for p in range(len(PIECE_TYPES))]
+
+        moves = []
+        examined = 0
+        for p, masks in pieces:
+            if any(plentiful[other] for other in _DOMINATING_PIECE_INDICES[p]):
+                examined += squares[p].bit_count()
+                continue
+            for index in iterate_bits(squares[p]):
+                moves.append(((masks[index] & l1).bit_count(), p, index))
+        self.counters.examined += examined + len(moves)
+        self.counters.upgrade += examined
+        moves.sort(reverse=True)
+        return moves
+
+    def order_placements(self, placements):
+        """为放置集合模拟出合法的放置顺序
+
+        先放所有能放的棋子，骷髅被消灭后再放其格子上的棋子。
+        成功时返回 (解, 0)，否则返回 (None, 仍阻挡放置的骷髅掩码)。
+        """
+        state = BitboardState.__new__(BitboardState)
+        state.layers = list(self.initial_layers)
+        state.occupied = self.initial_occupied
+        state.bombs_used = []
+        state.undo_stack = []
+        state.available_pieces = {piece_type: 64 for piece_type in PIECE_TYPES}
+        state.zobrist = 0
+
+        pending = [(PIECE_TYPES[p], index // 8, index % 8) for p, index in placements]
+        while pending:
+            blocked = []
+            for piece_type, x, y in pending:
+                if not state.apply(piece_type, x, y):
+                    blocked.append((piece_type, x, y))
+            if len(blocked) == len(pending):
+                return None, state.layers[0]
+            pending = blocked
+        return state.bombs_used, 0
+
+    def search(self, l1, l2, l3, chosen, depth, keys):
+        self.nodes += 1
+        if self.nodes > self.node_budget or (self.nodes & 255 == 0 and time.time() > self.deadline):
+            raise SearchBudgetExceeded()
+        if self.monitor is not None and self.nodes & 1023 == 0:
+            self.report()
+
+        if not l1:
+            solution, blocking = self.order_placements(self.placements)
+            if solution is not None:
+                self.best_solution = solution
+                if self.monitor is not None:
+                    self.report()
+                return
+            # 所有骷髅都受到了足够伤害但存在循环阻挡：任何包含当前放置的解都要额外攻击某个仍存活的骷髅
+            bound = 1
+            targets = blocking
+        else:
+            bound = self.lower_bound(l1, l2, l3, chosen, self.counts)
+            if bound is None:
+                return
+            targets = l1
+
+        if self.best_solution is not None and depth + bound >= len(self.best_solution):
+            return
+        if self.table.check_and_store(min(keys), depth):  # 互为对称的放置集合只展开一次
+            return
+
+        moves = self.branch_moves(l1, l2, l3, chosen, targets, depth, blocked=not l1)
+        if moves is None:
+            return
+        for _, p, index in moves:
+            attack = ATTACK_MASKS[PIECE_TYPES[p]][index]
+            self.counts[p] -= 1
+            self.placements.append((p, index))
+            placement_keys = _ZOBRIST_PLACEMENT_KEYS[p]
+            self.search((l1 & ~attack) | (l2 & attack), (l2 & ~attack) | (l3 & attack), l3 & ~attack,
+                        chosen | 1 << index, depth + 1,
+                        tuple(key ^ placement_keys[permutation[index]]
+                              for key, permutation in zip(keys, self.symmetries)))
+            self.placements.pop()
+            self.counts[p] += 1
+            if self.best_solution is not None and depth + bound >= len(self.best_solution):
+                return  # 已找到与下界相同的解
+
+    def report(self):
+        """向 monitor 汇报目前最好的解和展开的节点数"""
+        best = self.best_solution
+        self.monitor.checkpoint("精确搜索", 0 if best is None else len(best), 0 if best is not None else None,
+                                self.nodes, best)
+
+    def solve(self, initial_board, available_pieces, upper_bound_solution=None, fixed=()):
+        """搜索最少棋子的解，upper_bound_solution 为已知的可行解，用作初始上界
+
+        fixed 为必须保留的放置 [(piece_type, x, y), ...]：搜索只为其余部分寻找放置，得到的解包含它们。
+        """
+        start_time = time.time()
+        self.deadline = start_time + self.time_budget
+        self.nodes = 0
+        self.best_solution = upper_bound_solution
+        self.table = TranspositionTable(self.transposition_size)
+        self.counters = PruningCounters()
+
+        initial_state = BitboardState(initial_board, available_pieces)
+        self.initial_layers = initial_state.layers
+        self.initial_occupied = initial_state.occupied
+        self.counts = [available_pieces.get(piece_type, 0) for piece_type in PIECE_TYPES]
+        self.placements = []
+        # 初始棋盘自身的对称变换，用于合并互为对称的放置集合；有固定的放置时对称性不再成立
+        symmetries = board_symmetries(initial_state.board) if not fixed else [0]
+        self.symmetries = [SYMMETRY_PERMUTATIONS[k].tolist() for k in symmetries]
+
+        # 固定的放置按集合模型直接计入伤害（放置顺序最后统一模拟）
+        l1, l2, l3 = self.initial_layers
+        chosen = initial_state.occupied
+        for piece_type, x, y in fixed:
+            p = PIECE_TYPES.index(piece_type)
+            index = x * 8 + y
+            attack = ATTACK_MASKS[piece_type][index]
+            l1, l2, l3 = (l1 & ~attack) | (l2 & attack), (l2 & ~attack) | (l3 & attack), l3 & ~attack
+            chosen |= 1 << index
+            self.counts[p] -= 1
+            self.placements.append((p, index))
+
+        try:
+            self.search(l1, l2, l3, chosen, len(self.placements), (0,) * len(self.symmetries))
+            optimal = True
+        except SearchBudgetExceeded:
+            optimal = False
+
+        return SolveResult(self.best_solution, optimal, self.nodes, time.time() - start_time)
+
+
+def exact_search_solution(initial_board, available_pieces, node_budget=2_000_000, time_budget=10.0,
+                          seed_with_beam=True, monitor=None):
+    """精确求解最少棋子数的解
+
+    先做快速的可行性检查，再用束搜索得到一个可行解作为上界，最后用分支定界证明或改进它。
+    束搜索和分支定界共用 time_budget：束搜索超时则不提供上界，分支定界只使用剩下的时间。
+    预算用尽时返回目前最好的解，并在结果中标记未证明最优。monitor 用于汇报进度和取消。
+    """
+    start_time = time.time()
+    reasons = check_feasibility(initial_board, available_pieces)
+    if reasons:
+        print(f"精确搜索前已证明无解：{reasons[0]}")
+        return SolveResult(None, True, mode="feasibility")
+
+    stats = SearchStats()
+    seed = None
+    if seed_with_beam:
+        seed = batched_beam_search_solution(initial_board, available_pieces, beam_width=50, max_depth=64,
+                                            monitor=monitor, deadline=start_time + time_budget, stats=stats)
+
+    solver = ExactSolver(node_budget, max(0.0, time_budget - (time.time() - start_time)), monitor=monitor)
+    clock = time.perf_counter()
+    result = solver.solve(initial_board, available_pieces, seed)
+    stats.lap("exact", clock)
+    stats.expanded += result.nodes
+    stats.pruned += solver.counters.removed
+    stats.duplicates += solver.table.hits
+    stats.elapsed = time.time() - start_time
+    result.stats = stats
+    if result.solution is not None:
+        status = "已证明最优" if result.optimal else "未证明最优"
+        print(f"精确搜索完成，使用 {len(result.solution)} 个棋子（{status}），"
+              f"展开节点: {result.nodes}，剪除被支配移动: {solver.counters.removed}，用时: {result.elapsed:.2f}秒")
+    else:
+        status = "已证明无解" if result.optimal else "预算用尽"
+        print(f"精确搜索未找到解（{status}），展开节点: {result.nodes}，用时: {result.elapsed:.2f}秒")
+    return result
+
+
+def iterative_widening_solution(initial_board, available_pieces, time_budget=2.0, beam_width=10, moves_per_state=3,
+                                growth=2, max_depth=64, engine="bitboard", monitor=None):
+    """在时间预算内逐步加宽的束搜索
+
+    从较窄的束开始，每一轮把束宽和每个状态扩展的移动数乘以 growth 后重新搜索，直到超过时间预算，
+    或解的棋子数达到下界（此时已证明最优）。找到解之后的各轮只寻找更少棋子的解（深度上限为当前最好解减一）。
+    各轮共享候选移动的缓存，重复出现的状态不必重新计算移动评分。
+    """
+    start_time = time.time()
+    deadline = start_time + time_budget
+    initial_state = BitboardState(initial_board, available_pieces)
+    l1, l2, l3 = initial_state.layers
+    lower = ExactSolver().lower_bound(l1, l2, l3, initial_state.occupied,
+                                      [available_pieces.get(piece_type, 0) for piece_type in PIECE_TYPES])
+    if not l1:
+        return SolveResult([], True, mode="widening")
+    if lower is None:
+        print("逐步加宽搜索前已证明无解：伤害上界不足以消灭所有骷髅")
+        return SolveResult(None, True, mode="widening")
+
+    move_cache = TranspositionTable(1 << 18)
+    stats = SearchStats()
+    best = None
+    passes = 0
+    while time.time() < deadline and (best is None or len(best) > lower):
+        depth_limit = max_depth if best is None else len(best) - 1
+        solution = beam_search_solution(initial_board, available_pieces, beam_width, depth_limit, engine,
+                                        monitor=monitor, moves_per_state=moves_per_state, move_cache=move_cache,
+                                        deadline=deadline, stats=stats)
+        passes += 1
+        if solution is not None and (best is None or len(solution) < len(best)):
+            best = solution
+            print(f"第 {passes} 轮（束宽 {beam_width}，每个状态 {moves_per_state} 个移动）找到 {len(best)} 个棋子的解")
+        beam_width *= growth
+        moves_per_state = min(moves_per_state * growth, len(PIECE_TYPES) * 64)
+
+    elapsed = time.time() - start_time
+    optimal = best is not None and len(best) <= lower
+    print(f"逐步加宽搜索完成 {passes} 轮，"
+          f"{'未找到解' if best is None else f'最好的解使用 {len(best)} 个棋子'}，"
+          f"移动缓存命中: {move_cache.hits}，用时: {elapsed:.2f}秒")
+    stats.elapsed = elapsed
+    return SolveResult(best, optimal, stats.expanded, elapsed, "widening", stats)
+
+
+def large_neighborhood_search(initial_board, available_pieces, solution, time_budget=2.0, neighborhood=3,
+                              node_budget=5_000, seed=None, monitor=None):
+    """大邻域搜索：反复移除解中的k个放置，用精确搜索在剩余棋子下重新求解释放出的子问题
+
+    移除的放置一半时间随机挑选，一半时间挑选与某个放置攻击范围重叠最多的几个（它们共同负责同一片骷髅）。
+    子问题只寻找比当前解更少棋子的补全，每次受 node_budget 限制，所以很快；
+    连续 len(解) 次没有改进时邻域大小加一，邻域覆盖整个解且搜索完成时即证明了最优。
+    """
+    start_time = time.time()
+    deadline = start_time + time_budget
+    rng = random.Random(seed)
+    best = list(solution)
+    initial_count = len(best)
+    optimal = False
+    nodes = iterations = failures = 0
+    stats = SearchStats()
+    k = neighborhood
+
+    while best and time.time() < deadline:
+        k = min(k, len(best))
+        if rng.random() < 0.5:
+            removed = set(rng.sample(range(len(best)), k))
+        else:
+            center = rng.randrange(len(best))
+            center_mask = ATTACK_MASKS[best[center][0]][best[center][1] * 8 + best[center][2]]
+            overlap = [((ATTACK_MASKS[piece_type][x * 8 + y] & center_mask).bit_count(), rng.random(), i)
+                       for i, (piece_type, x, y) in enumerate(best) if i != center]
+            removed = {center} | {i for _, _, i in heapq.nlargest(k - 1, overlap)}
+        kept = [move for i, move in enumerate(best) if i not in removed]
+
+        solver = ExactSolver(node_budget, deadline - time.time())
+        clock = time.perf_counter()
+        result = solver.solve(initial_board, available_pieces, best, fixed=kept)
+        stats.lap("exact", clock)
+        stats.pruned += solver.counters.removed
+        stats.duplicates += solver.table.hits
+        nodes += result.nodes
+        iterations += 1
+        if len(result.solution) < len(best):
+            best = result.solution
+            failures = 0
+            if monitor is not None:
+                monitor.checkpoint("大邻域搜索", len(best), 0, nodes, best)
+        elif result.optimal and k == len(best):
+            optimal = True  # 整个解都被释放且搜索完成：已证明最优
+            break
+        else:
+            failures += 1
+            if failures >= len(best):
+                k += 1
+                failures = 0
+            if monitor is not None and iterations % 16 == 0:
+                monitor.checkpoint("大邻域搜索", len(best), 0, nodes, best)
+
+    elapsed = time.time() - start_time
+    print(f"大邻域搜索 {iterations} 次，棋子数从 {initial_count} 减少到 {len(best)}"
+          f"{'（已证明最优）' if optimal else ''}，邻域大小: {k}，用时: {elapsed:.2f}秒")
+    stats.expanded += nodes
+    stats.elapsed = elapsed
+    return SolveResult(best, optimal, nodes, elapsed, "lns", stats)
+
+
+def polished_beam_solution(initial_board, available_pieces, time_budget=2.0, beam_width=10, max_depth=64,
+                           engine="bitboard", monitor=None):
+    """先用束搜索快速得到一个解，再在剩余的时间预算内用大邻域搜索减少棋子数"""
+    start_time = time.time()
+    stats = SearchStats()
+    solution = beam_search_solution(initial_board, available_pieces, beam_width, max_depth, engine, monitor=monitor,
+                                    stats=stats)
+    if solution is None:
+        return SolveResult(None, False, 0, time.time() - start_time, "lns", stats)
+    result = large_neighborhood_search(initial_board, available_pieces, solution,
+                                       max(0.0, time_budget - (time.time() - start_time)), monitor=monitor)
+    result.elapsed = time.time() - start_time
+    result.stats = stats.merge(result.stats)
+    result.stats.elapsed = result.elapsed
+    return result
+
+
+def batched_rollouts(board, inventory, rollouts, rng, max_steps=64, greed=2.0):
+    """从同一状态同时进行多次随机模拟，所有模拟的每一步在NumPy中一起计算
+
+    每一步按伤害的 greed 次幂加权随机选择移动（伤害越高越可能被选中），直到消灭所有骷髅或无棋可走。
+    board 为长度64的棋盘向量，inventory 为按 PIECE_TYPES 排列的棋子数量，rng 为 np.random.Generator。
+    返回 (每次模拟使用的棋子数, 剩余生命值, 移动编号 p*64+s 组成的 (rollouts, 步数) 数组，未使用的位置为 -1)。
+    """
+    boards = np.repeat(np.asarray(board, dtype=np.int8).reshape(1, 64), rollouts, axis=0)
+    inventories = np.repeat(np.asarray(inventory, dtype=np.int64).reshape(1, -1), rollouts, axis=0)
+    moves = np.full((rollouts, max_steps), -1, dtype=np.int64)
+    used = np.zeros(rollouts, dtype=np.int64)
+    active = np.maximum(boards, 0).sum(axis=1) > 0
+
+    for step in range(max_steps):
+        rows = np.flatnonzero(active)
+        if len(rows) == 0:
+            break
+        current = boards[rows]
+        damage = (current > 0).astype(np.float32) @ ATTACK_MATRIX.T  # (n, 6*64)
+        valid = (current == 0)[:, None, :] & (inventories[rows] > 0)[:, :, None]
+        weights = np.where(valid.reshape(len(rows), -1), damage, 0) ** greed
+        totals = weights.sum(axis=1)
+        stuck = totals <= 0
+        active[rows[stuck]] = False  # 无棋可走，模拟失败
+        rows, current, weights, totals = rows[~stuck], current[~stuck], weights[~stuck], totals[~stuck]
+        if len(rows) == 0:
+            break
+
+        # 按权重抽样：累积和中第一个超过均匀随机数的位置
+        thresholds = rng.random(len(rows)) * totals
+        choices = np.minimum((np.cumsum(weights, axis=1) < thresholds[:, None]).sum(axis=1), weights.shape[1] - 1)
+        piece_indices, squares = np.divmod(choices, 64)
+        current = current - ATTACK_MATRIX[choices].astype(np.int8) * (current > 0)
+        current[np.arange(len(rows)), squares] = -1
+        boards[rows] = current
+        inventories[rows, piece_indices] -= 1
+        moves[rows, step] = choices
+        used[rows] += 1
+        active[rows] = np.maximum(current, 0).sum(axis=1) > 0
+
+    return used, np.maximum(boards, 0).sum(axis=1), moves
+
+
+class MCTSNode:
+    """蒙特卡洛树搜索的节点，children 为已展开的子节点，untried 为尚未展开的移动（效率高的先展开）"""
+
+    def __init__(self, state, parent=None, move=None, branching=8):
+        self.state = state
+        self.parent = parent
+        self.move = move
+        self.children = []
+        self.untried = [] if state.is_solved() else state.top_moves(branching)[::-1]
+        self.visits = 0
+        self.value = 0.0
+
+    def select_child(self, exploration):
+        """按 UCT 公式选择子节点"""
+        log_visits = math.log(self.visits)
+        return max(self.children,
+                   key=lambda child: child.value / child.visits + exploration * math.sqrt(log_visits / child.visits))
+
+
+def mcts_solution(initial_board, available_pieces, time_budget=2.0, node_budget=100_000, rollouts=32, branching=8,
+                  exploration=0.7, greed=2.0, seed=None, monitor=None):
+    """蒙特卡洛树搜索
+
+    选择阶段用 UCT，展开时按效率从高到低依次加入子节点，每个新节点一次做 rollouts 次批量随机模拟。
+    模拟成功的收益为 1 + 下界/棋子数（棋子越少越高），失败为 0.5 * 已消灭的生命值比例。
+    任何一次模拟成功都会记录完整的解，返回所有模拟中棋子最少的解。
+    """
+    start_time = time.time()
+    deadline = start_time + time_budget
+    rng = np.random.default_rng(seed)
+    root_state = BitboardState(initial_board, available_pieces)
+    if root_state.is_solved():
+        return SolveResult([], True, mode="mcts")
+    l1, l2, l3 = root_state.layers
+    lower = ExactSolver().lower_bound(l1, l2, l3, root_state.occupied, inventory_vector(available_pieces).tolist())
+    if lower is None:
+        print("蒙特卡洛树搜索前已证明无解：伤害上界不足以消灭所有骷髅")
+        return SolveResult(None, True, mode="mcts")
+
+    initial_health = root_state.remaining_health()
+    root = MCTSNode(root_state, branching=branching)
+    best = None
+    nodes = 0
+    stats = SearchStats()
+
+    while nodes < node_budget and time.time() < deadline:
+        # 选择：沿 UCT 最大的子节点下降，直到遇到还有未展开移动的节点
+        node = root
+        while not node.untried and node.children:
+            node = node.select_child(exploration)
+
+        # 展开
+        if node.untried:
+            clock = time.perf_counter()
+            _, piece_type, x, y = node.untried.pop()
+            node.children.append(MCTSNode(node.state.place_piece(piece_type, x, y), node, (piece_type, x, y),
+                                          branching))
+            node = node.children[-1]
+            nodes += 1
+            stats.copies += 1
+            stats.moves_scored += len(node.untried)
+            stats.lap("expansion", clock)
+
+        # 模拟
+        state = node.state
+        prefix = state.bombs_used
+        if state.is_solved():
+            rewards = np.full(1, 1.0 + lower / max(len(prefix), 1))
+            if best is None or len(prefix) < len(best):
+                best = prefix
+        else:
+            inventory = inventory_vector(state.available_pieces)
+            clock = time.perf_counter()
+            used, health, moves = batched_rollouts(state.board_vector(), inventory, rollouts, rng, greed=greed)
+            stats.lap("rollouts", clock)
+            stats.generated += int(used.sum())
+            solved = health == 0
+            total = len(prefix) + used
+            rewards = np.where(solved, 1.0 + lower / np.maximum(total, 1), 0.5 * (1 - health / initial_health))
+            if solved.any():
+                winner = int(np.argmin(np.where(solved, total, np.iinfo(np.int64).max)))
+                if best is None or total[winner] < len(best):
+                    best = prefix + [(PIECE_TYPES[move // 64], move % 64 // 8, move % 8)
+                                     for move in moves[winner, :used[winner]].tolist()]
+            if not node.untried and not node.children:
+                rewards = np.zeros(1)  # 死局：没有能造成伤害的移动
+
+        # 回传：一批模拟按各自次数计入访问次数
+        while node is not None:
+            node.visits += len(rewards)
+            node.value += float(rewards.sum())
+            node = node.parent
+
+        if monitor is not None and nodes % 64 == 0:
+            monitor.checkpoint("蒙特卡洛树搜索", 0 if best is None else len(best), None, nodes, best)
+        if best is not None and len(best) <= lower:
+            break  # 达到下界，已是最优
+
+    elapsed = time.time() - start_time
+    optimal = best is not None and len(best) <= lower
+    print(f"蒙特卡洛树搜索展开 {nodes} 个节点、模拟 {root.visits} 次，"
+          f"{'未找到解' if best is None else f'最好的解使用 {len(best)} 个棋子'}，用时: {elapsed:.2f}秒")
+    stats.expanded = nodes
+    stats.elapsed = elapsed
+    return SolveResult(best, optimal, nodes, elapsed, "mcts", stats)
+
+
+def iter_solve(initial_board, available_pieces, solver=exact_search_solution, monitor=None):
+    """以迭代器的形式随时可中断地求解
+
+    solver(board, available_pieces, monitor=...) 在后台线程中运行，迭代器依次产出它汇报的 SolveProgress，
+    最后一项的 done 为真、result 为最终结果。monitor.cancel() 或关闭迭代器后，求解在下一个扩展步骤停止，
+    最后一项的 result 为目前最好的解（未证明最优，mode 为 "cancelled"）。
+    """
+    monitor = monitor or SolveMonitor()
+    updates = queue.Queue()
+    monitor.callback = updates.put
+
+    def run():
+        try:
+            result = solver(initial_board, available_pieces, monitor=monitor)
+            if not isinstance(result, SolveResult):
+                result = SolveResult(result, False, mode="beam")
+        except SolveCancelled:
+            result = SolveResult(monitor.best, False, monitor.nodes, time.time() - monitor.start_time, "cancelled")
+        except Exception as e:
+            updates.put(e)
+            return
+        updates.put(SolveProgress("完成", 0 if result.solution is None else len(result.solution),
+                                  0 if result.solution is not None else None, result.nodes or monitor.nodes,
+                                  time.time() - monitor.start_time, result.solution, True, result))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while True:
+            update = updates.get()
+            if isinstance(update, Exception):
+                raise update
+            yield update
+            if update.done:
+                return
+    finally:
+        monitor.cancel()  # 迭代器提前关闭时让后台线程尽快停止
+
+
+# 规范朝向下的求解结果缓存，旋转或镜像后的相同谜题共享
+CANONICAL_RESULTS = TranspositionTable(256)
+
+
+def solve_canonical(initial_board, available_pieces, solver=exact_search_solution, cache=CANONICAL_RESULTS,
+                    use_cached=True, monitor=None):
+    """在规范朝向上求解并缓存结果，再把解映射回原棋盘的朝向
+
+    solver 可以返回 SolveResult 或解的列表。use_cached 为假时总是重新求解（结果仍写入缓存）；
+    缓存的 store 若返回结果（如 SolutionCache 保留了更好的旧结果），则以它的解为准。
+    给出 monitor 时把它传给 solver，并让它汇报的解同样映射回原棋盘的朝向。
+    """
+    canonical, k = canonicalize_board(initial_board)
+    key = canonical_key(canonical, available_pieces)
+    result = cache.lookup(key) if use_cached else None
+    if result is None:
+        if monitor is not None:
+            monitor.orientation = SYMMETRY_INVERSE[k]
+            result = solver(canonical, available_pieces, monitor=monitor)
+        else:
+            result = solver(canonical, available_pieces)
+        if result is not None:
+            kept = cache.store(key, result)
+            if kept is not None and kept is not result:
+                # 缓存保留了更好的旧结果：返回它，但附上这次求解的节点数、用时和统计
+                result = SolveResult(kept.solution, kept.optimal, result.nodes, result.elapsed, kept.mode,
+                                     result.stats)
+
+    return orient_result(result, SYMMETRY_INVERSE[k])
+
+
+def orient_result(result, k):
+    """对求解结果（SolveResult 或解的列表）中的解施加第k种对称变换"""
+    if isinstance(result, SolveResult):
+        return SolveResult(transform_solution(result.solution, k), result.optimal, result.nodes, result.elapsed,
+                           result.mode, result.stats)
+    return transform_solution(result, k)
+
+
+# 求解器的结果可能改变时（例如修正了错误的最优性证明）加1，旧版本写入的磁盘缓存条目随之失效。
+# 版本2：修正精确搜索在循环阻挡时不完备、可能给出错误的“已证明”结论
+CACHE_SOLVER_VERSION = 2
+
+
+class SolutionCache:
+    """以规范谜题编码为键的持久化解缓存
+
+    结果保存在本地 SQLite 文件中，前面有一层内存 LRU；条目数超过 max_entries 时淘汰最久未使用的条目。
+    每个条目记录解（规范朝向）、棋子数、是否已证明最优以及求解方式。
+    写入时只在新结果更好时才覆盖旧结果：棋子更少，或棋子数相同但新结果已证明最优；没有解的结果不会覆盖已有的解。
+    每个条目还记录写入时的 CACHE_SOLVER_VERSION，打开缓存时删除旧版本求解器写入的条目。
+    接口与 TranspositionTable 的 lookup/store 兼容，可直接作为 solve_canonical 的缓存。
+    """
+
+    def __init__(self, path="solution_cache.sqlite3", memory_size=256, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory = TranspositionTable(memory_size)
+        self.lock = threading.Lock()
+        with self.connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS solutions (
+                                key TEXT PRIMARY KEY,
+                                solution TEXT,
+                                piece_count INTEGER,
+                                optimal INTEGER NOT NULL,
+                                mode TEXT,
+                                created REAL NOT NULL,
+                                last_used REAL NOT NULL,
+                                solver_version INTEGER NOT NULL DEFAULT 0)""")
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(solutions)")]
+            if "solver_version" not in columns:  # 加入版本之前创建的缓存文件，其中的条目都视为旧版本
+                conn.execute("ALTER TABLE solutions ADD COLUMN solver_version INTEGER NOT NULL DEFAULT 0")
+            conn.execute("DELETE FROM solutions WHERE solver_version != ?", (CACHE_SOLVER_VERSION,))
+
+    @contextlib.contextmanager
+    def connect(self):
+        """打开数据库连接，正常结束时提交并关闭"""
+        import sqlite3  # 延迟导入，不使用磁盘缓存的进程不必加载
+
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def digest(key):
+        """把规范编码压缩为短哈希"""
+        return hashlib.blake2b(key, digest_size=16).hexdigest()
+
+    @staticmethod
+    def is_better(new, old):
+        """new 是否比 old 更好"""
+        if old is None:
+            return True
+        if new.solution is None:
+            # 已有的解可以直接验证，不被“无解”的结论覆盖
+            return old.solution is None and new.optimal and not old.optimal
+        if old.solution is None:
+            return True
+        if len(new.solution) != len(old.solution):
+            return len(new.solution) < len(old.solution)
+        return new.optimal and not old.optimal
+
+    def lookup(self, key):
+        """按规范编码查找，返回规范朝向上的 SolveResult 或 None"""
+        digest = self.digest(key)
+        with self.lock:
+            result = self.memory.lookup(digest)
+            if result is not None:
+                return result
+
+            with self.connect() as conn:
+                row = conn.execute("SELECT solution, optimal, mode FROM solutions WHERE key = ?", (digest,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE solutions SET last_used = ? WHERE key = ?", (time.time(), digest))
+
+            solution = None if row[0] is None else [tuple(move) for move in json.loads(row[0])]
+            result = SolveResult(solution, bool(row[1]), mode=row[2])
+            self.memory.store(digest, result)
+            return result
+
+    def store(self, key, result):
+        """写入规范朝向上的结果，返回缓存中实际保留的（更好的）结果
+
+        未证明无解的“无解”结果不写入。
+        """
+        if result.solution is None and not result.optimal:
+            return None
+
+        old = self.lookup(key)
+        if not self.is_better(result, old):
+            return old
+
+        digest = self.digest(key)
+        encoded = None if result.solution is None else json.dumps([list(move) for move in result.solution])
+        piece_count = None if result.solution is None else len(result.solution)
+        now = time.time()
+        with self.lock:
+            self.memory.store(digest, result)
+            with self.connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (digest, encoded, piece_count, int(result.optimal), result.mode, now, now,
+                              CACHE_SOLVER_VERSION))
+                excess = conn.execute("SELECT COUNT(*) FROM solutions").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    conn.execute("DELETE FROM solutions WHERE key IN "
+                                 "(SELECT key FROM solutions ORDER BY last_used LIMIT ?)", (excess,))
+        return result
+
+    def get(self, board, available_pieces):
+        """按棋盘查找缓存的结果，解已映射回该棋盘的朝向"""
+        canonical, k = canonicalize_board(board)
+        result = self.lookup(canonical_key(canonical, available_pieces))
+        if result is None:
+            return None
+        return orient_result(result, SYMMETRY_INVERSE[k])
+
+
+def interaction_components(board, available_pieces):
+    """按骷髅之间的相互作用把棋盘拆分为互不影响的分量，返回每个分量的骷髅掩码列表
+
+    两个骷髅相连当且仅当：某个可放置棋子的格子（空格或骷髅格）上的某种可用棋子能攻击其中一个，
+    同时该格子上的某种可用棋子能攻击另一个（共享移动或争用同一格子）；
+    或者一个骷髅所在的格子上能放置攻击另一个骷髅的棋子（要先消灭前者才能放置）。
+    不同分量之间只通过棋子数量相互影响。
+    """
+    state = BitboardState(board, available_pieces)
+    alive = state.layers[0]
+    pieces = [ATTACK_MASKS[piece_type] for piece_type, count in available_pieces.items() if count > 0]
+
+    parent = list(range(64))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for square in iterate_bits(~state.occupied & FULL_MASK):
+        hit = 0
+        for masks in pieces:
+            hit |= masks[square] & alive
+        if alive >> square & 1:
+            hit |= 1 << square
+        if not hit:
+            continue
+        root = find((hit & -hit).bit_length() - 1)
+        for index in iterate_bits(hit):
+            parent[find(index)] = root
+
+    components = {}
+    for index in iterate_bits(alive):
+        root = find(index)
+        components[root] = components.get(root, 0) | 1 << index
+    return sorted(components.values())
+
+
+def component_board(board, component):
+    """只保留分量中的骷髅，其余骷髅格子标记为不可放置"""
+    flat = np.asarray(board).ravel().copy()
+    for index in range(64):
+        if flat[index] > 0 and not component >> index & 1:
+            flat[index] = -1
+    return flat.reshape(8, 8)
+
+
+# 进程池工作进程中的取消信号，由 init_component_worker 在进程启动时设置
+COMPONENT_CANCEL = None
+
+
+def init_component_worker(cancelled):
+    global COMPONENT_CANCEL
+    COMPONENT_CANCEL = cancelled
+
+
+def solve_component(solver, board, pieces, cancelled=None):
+    """求解一个子问题；有取消信号（参数或工作进程中的 COMPONENT_CANCEL）时，用只共享取消请求的 monitor 调用 solver
+
+    子问题的进度和解不汇报给调用者的 monitor，以免把只覆盖一个分量的解当成整盘的解。
+    """
+    cancelled = cancelled if cancelled is not None else COMPONENT_CANCEL
+    if cancelled is None:
+        return solver(board, pieces)
+    monitor = SolveMonitor()
+    monitor.cancelled = cancelled
+    return solver(board, pieces, monitor=monitor)
+
+
+def solve_all(solver, problems, max_workers=None, monitor=None):
+    """求解多个子问题，多于一个时使用进程池并行
+
+    给出 monitor 时每完成一个子问题（并行时每0.1秒）汇报一次进度，并把取消请求传给正在运行的子问题
+    （solver 需接受 monitor 参数）：顺序求解时共享 monitor 的取消事件，并行时通过进程间共享的事件。
+    取消或某个子问题出错（包括进程池损坏）时，等待各工作进程停止后再抛出异常，不留下仍在占用CPU的进程。
+    """
+    cancelled = monitor.cancelled if monitor is not None else None
+    if max_workers == 1 or len(problems) <= 1:
+        results = []
+        for board, pieces in problems:
+            if monitor is not None:
+                monitor.checkpoint("求解分量", len(results))
+            results.append(solve_component(solver, board, pieces, cancelled))
+        return results
+    import multiprocessing  # 延迟导入，单个子问题时不必加载多进程模块
+    from concurrent.futures import ProcessPoolExecutor, wait
+
+    context = multiprocessing.get_context()
+    shared_cancel = context.Event() if monitor is not None else None
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=init_component_worker,
+                                   initargs=(shared_cancel,))
+    try:
+        futures = [executor.submit(solve_component, solver, board, pieces) for board, pieces in problems]
+        pending = futures
+        while monitor is not None and pending:
+            _, pending = wait(pending, timeout=0.1)
+            monitor.checkpoint("求解分量", len(futures) - len(pending))
+        return [future.result() for future in futures]
+    except BaseException:
+        if shared_cancel is not None:
+            shared_cancel.set()  # 取消或某个子问题出错时，让其余仍在运行的子问题尽快停止
+        raise
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def piece_usage(solution):
+    """统计解中每种棋子的数量"""
+    usage = {piece_type: 0 for piece_type in PIECE_TYPES}
+    for piece_type, _, _ in solution:
+        usage[piece_type] += 1
+    return usage
+
+
+def allocate_inventory(options, available_pieces):
+    """在每个分量的候选解中各选一个，使棋子总数不超过库存且总棋子数最少
+
+    options[i] 为第i个分量的候选解列表，返回选中的解列表，无法满足时返回 None。
+    """
+    options = [sorted(component_options, key=len) for component_options in options]
+    best = [None, None]  # [总棋子数, 选择]
+
+    def search(i, used, total, chosen):
+        if best[0] is not None and total >= best[0]:
+            return
+        if i == len(options):
+            best[0], best[1] = total, list(chosen)
+            return
+        for solution in options[i]:
+            usage = piece_usage(solution)
+            if all(used[piece_type] + usage[piece_type] <= available_pieces.get(piece_type, 0)
+                   for piece_type in PIECE_TYPES):
+                chosen.append(solution)
+                search(i + 1, {piece_type: used[piece_type] + usage[piece_type] for piece_type in PIECE_TYPES},
+                       total + len(solution), chosen)
+                chosen.pop()
+
+    search(0, {piece_type: 0 for piece_type in PIECE_TYPES}, 0, [])
+    return best[1]
+
+
+def decomposed_solution(initial_board, available_pieces, solver=exact_search_solution, max_workers=None, monitor=None):
+    """先把棋盘拆分为互不影响的分量分别求解，再在分量之间分配棋子
+
+    solver(board, available_pieces) 需返回 SolveResult 且可被 pickle（用于进程池）。
+    各分量用完整库存求得的解若总数不超过库存，合并即为答案（各分量最优时整体也最优）；
+    否则为每个分量在限制了争用棋子数量后重新求解，得到若干候选解，再选出满足库存的最少组合。
+    仍无法分配时退回到整盘求解。
+    给出 monitor 时，整盘求解会把它传给 solver（solver 需接受 monitor 参数），分量求解汇报完成的个数，
+    并响应取消请求。
+    """
+    start_time = time.time()
+    whole_board_solver = solver if monitor is None else functools.partial(solver, monitor=monitor)
+    components = interaction_components(initial_board, available_pieces)
+    if len(components) <= 1:
+        return whole_board_solver(initial_board, available_pieces)
+
+    print(f"棋盘拆分为 {len(components)} 个独立分量")
+    boards = [component_board(initial_board, component) for component in components]
+    results = solve_all(solver, [(board, available_pieces) for board in boards], max_workers, monitor)
+    nodes = sum(result.nodes for result in results)
+    stats = SearchStats()  # 各分量求解的统计之和
+    for result in results:
+        if result.stats is not None:
+            stats.merge(result.stats)
+    stats.elapsed = time.time() - start_time
+
+    if any(result.solution is None for result in results):
+        # 某个分量即使用上全部棋子也无解（若已证明，整盘同样无解）
+        optimal = all(result.optimal for result in results if result.solution is None)
+        return SolveResult(None, optimal, nodes, time.time() - start_time, "decomposed", stats)
+
+    solutions = [result.solution for result in results]
+    usages = [piece_usage(solution) for solution in solutions]
+    total_usage = {piece_type: sum(usage[piece_type] for usage in usages) for piece_type in PIECE_TYPES}
+    contested = [piece_type for piece_type in PIECE_TYPES if total_usage[piece_type] > available_pieces.get(piece_type, 0)]
+    if not contested:
+        optimal = all(result.optimal for result in results)
+        return SolveResult([move for solution in solutions for move in solution], optimal, nodes,
+                           time.time() - start_time, "decomposed", stats)
+
+    # 争用的棋子：为每个分量生成限制数量后的候选解
+    problems = []
+    owners = []
+    for i, (board, usage) in enumerate(zip(boards, usages)):
+        for piece_type in contested:
+            others = total_usage[piece_type] - usage[piece_type]
+            for cap in sorted({max(0, available_pieces.get(piece_type, 0) - others), 0}):
+                if cap < usage[piece_type]:
+                    pieces = dict(available_pieces)
+                    pieces[piece_type] = cap
+                    problems.append((board, pieces))
+                    owners.append(i)
+    options = [[solution] for solution in solutions]
+    for i, result in zip(owners, solve_all(solver, problems, max_workers, monitor)):
+        nodes += result.nodes
+        if result.stats is not None:
+            stats.merge(result.stats)
+        if result.solution is not None:
+            options[i].append(result.solution)
+
+    chosen = allocate_inventory(options, available_pieces)
+    if chosen is None:
+        print("分量之间无法分配棋子，改为整盘求解")
+        return whole_board_solver(initial_board, available_pieces)
+    stats.elapsed = time.time() - start_time
+    return SolveResult([move for solution in chosen for move in solution], False, nodes, time.time() - start_time,
+                       "decomposed", stats)
+
+
+def randomized_restart_solution(initial_board, available_pieces, restarts=200, choices=3, seed=None, time_budget=None):
+    """随机重启的贪心搜索
+
+    第一次按效率贪心，之后每一步在效率最高的 choices 个移动中按效率加权随机挑选，
+    多次重启后返回棋子最少的解；已不可能比当前最好解更少的尝试会提前放弃。
+    """
+    start_time = time.time()
+    rng = random.Random(seed)
+    best = None
+    state = BitboardState(initial_board, available_pieces)  # 每次重启原地放置棋子，结束后全部撤销
+    for restart in range(restarts):
+        while not state.is_solved():
+            if best is not None and len(state.bombs_used) + 1 >= len(best):
+                break
+            moves = state.top_moves(choices)
+            if not moves:
+                break
+            if restart == 0:
+                _, piece_type, x, y = moves[0]
+            else:
+                _, piece_type, x, y = rng.choices(moves, weights=[move[0] for move in moves])[0]
+            state.apply(piece_type, x, y)
+        if state.is_solved() and (best is None or len(state.bombs_used) < len(best)):
+            best = list(state.bombs_used)
+        while state.bombs_used:
+            state.undo()
+        if time_budget is not None and time.time() - start_time > time_budget:
+            break
+    if best is not None:
+        print(f"随机重启完成 {restart + 1} 次，最好的解使用 {len(best)} 个棋子，用时: {time.time() - start_time:.2f}秒")
+    else:
+        print(f"随机重启完成 {restart + 1} 次，未找到解")
+    return best
+
+
+# 组合求解可用的求解函数，以及它们是否接受 time_budget 参数
+PORTFOLIO_SOLVERS = {
+    "beam": (beam_search_solution, False),
+    "batched": (batched_beam_search_solution, False),
+    "exact": (exact_search_solution, True),
+    "random": (randomized_restart_solution, True),
+    "widening": (iterative_widening_solution, True),
+    "lns": (polished_beam_solution, True),
+    "mcts": (mcts_solution, True),
+}
+
+# 默认的组合：(配置名称, 求解函数, 关键字参数)
+DEFAULT_PORTFOLIO = [
+    ("exact", "exact", {}),
+    ("beam-narrow", "beam", {"beam_width": 10, "max_depth": 64, "engine": "bitboard"}),
+    ("beam-wide", "batched", {"beam_width": 500, "max_depth": 64}),
+    ("random-restarts", "random", {"restarts": 2000, "seed": 0}),
+]
+
+
+def run_portfolio_config(name, kind, kwargs, initial_board, available_pieces, results):
+    """在组合求解的子进程中运行一个配置，把 (名称, 解, 是否最优, 节点数) 放入结果队列"""
+    solver, _ = PORTFOLIO_SOLVERS[kind]
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        try:
+            result = solver(initial_board, available_pieces, **kwargs)
+        except Exception as e:
+            results.put((name, None, False, 0, str(e)))
+            return
+    if not isinstance(result, SolveResult):
+        result = SolveResult(result, False, mode=name)
+    results.put((name, result.solution, result.optimal, result.nodes, None))
+
+
+class PortfolioStats:
+    """各配置的胜出统计，保存为JSON文件，用于调整配置的启动顺序
+
+    多个进程（例如批量求解的工作进程）可能共用同一个文件：写入时持有锁文件，先重新读取文件，把本次的计数加到
+    文件中已有的计数上，再写入临时文件并用 os.replace 替换，读者不会读到写了一半的文件，也不会丢失其他进程累积的统计。
+    """
+
+    def __init__(self, path="portfolio_stats.json"):
+        self.path = path
+        self.entries = self.load()  # 名称 -> {"runs", "wins", "win_time"}
+
+    def load(self):
+        """读取统计文件，文件不存在或损坏时返回空字典"""
+        if self.path is None or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def entry_of(entries, name):
+        return entries.setdefault(name, {"runs": 0, "wins": 0, "win_time": 0.0})
+
+    def entry(self, name):
+        return self.entry_of(self.entries, name)
+
+    def win_rate(self, name):
+        entry = self.entries.get(name)
+        if not entry or not entry["runs"]:
+            return 0.0
+        return entry["wins"] / entry["runs"]
+
+    def runs(self, name):
+        entry = self.entries.get(name)
+        return entry["runs"] if entry else 0
+
+    def record(self, names, winner, elapsed):
+        """记录一次组合求解：names 中的配置各参加一次，winner 胜出（可为None）"""
+        def apply(entries):
+            for name in names:
+                self.entry_of(entries, name)["runs"] += 1
+            if winner is not None:
+                self.entry_of(entries, winner)["wins"] += 1
+                self.entry_of(entries, winner)["win_time"] += elapsed
+
+        if self.path is None:
+            apply(self.entries)
+            return
+        # 在文件中最新的计数上累加，而不是用本进程的副本覆盖；读取到替换之间持有锁文件，避免并发写入互相丢失计数
+        with self.locked():
+            entries = self.load()
+            apply(entries)
+            self.entries = entries
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(entries, f, ensure_ascii=False, indent=2)
+                os.replace(temp_path, self.path)
+            except OSError:
+                with contextlib.suppress(OSError):
+                    os.remove(temp_path)
+
+    @contextlib.contextmanager
+    def locked(self, timeout=2.0, stale=10.0):
+        """用 O_EXCL 创建的锁文件串行化读改写；等待超过 timeout 仍未拿到锁时不加锁继续，超过 stale 秒的锁视为残留并清除"""
+        lock_path = self.path + ".lock"
+        give_up = time.time() + timeout
+        fd = None
+        while fd is None:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                with contextlib.suppress(OSError):
+                    if time.time() - os.path.getmtime(lock_path) > stale:
+                        os.remove(lock_path)
+                        continue
+                if time.time() > give_up:
+                    break
+                time.sleep(0.005)
+            except OSError:
+                break
+        try:
+            yield
+        finally:
+            if fd is not None:
+                os.close(fd)
+                with contextlib.suppress(OSError):
+                    os.remove(lock_path)
+
+    def order(self, configs, slots=None):
+        """按胜率从高到低排列配置（胜率相同时保持原顺序），slots 不为 None 时只取前 slots 个
+
+        配置放不下时保留一个探索名额，给其余配置中参加次数最少的一个，否则没有统计的配置永远无法靠胜率排到前面。
+        只有一个名额时只探索还从未参加过的配置。
+        """
+        ranked = sorted(configs, key=lambda config: -self.win_rate(config[0]))
+        if slots is None or slots >= len(ranked):
+            return ranked
+        if slots <= 0:
+            return []
+        chosen, rest = ranked[:slots - 1], ranked[slots - 1:]
+        explore = min(rest, key=lambda config: self.runs(config[0]))
+        if slots == 1 and self.runs(explore[0]) > 0:
+            explore = rest[0]
+        return chosen + [explore]
+
+
+class PortfolioSolver:
+    """组合求解：在多个进程中同时运行不同的求解配置
+
+    出现已证明最优的解（或 first_result 为真时出现任何解）就立即返回，
+    否则等到所有配置结束或超过期限，取棋子最少的解；其余仍在运行的进程会被终止。
+    max_workers 限制同时运行的配置数，按历史胜率挑选靠前的配置，并留一个名额轮流给参加次数最少的配置。
+    """
+
+    def __init__(self, configs=None, deadline=5.0, first_result=False, max_workers=None,
+                 stats_path="portfolio_stats.json"):
+        self.configs = list(DEFAULT_PORTFOLIO if configs is None else configs)
+        self.deadline = deadline
+        self.first_result = first_result
+        self.max_workers = max_workers
+        self.stats = PortfolioStats(stats_path)
+
+    def __call__(self, initial_board, available_pieces):
+        return self.solve(initial_board, available_pieces)
+
+    def solve(self, initial_board, available_pieces):
+        import multiprocessing  # 延迟导入，不使用组合求解时不必加载
+
+        start_time = time.time()
+        configs = self.stats.order(self.configs, self.max_workers)
+        results = multiprocessing.Queue()
+        processes = []
+        for name, kind, kwargs in configs:
+            kwargs = dict(kwargs)
+            if PORTFOLIO_SOLVERS[kind][1]:
+                kwargs.setdefault("time_budget", self.deadline * 0.9)  # 留出把结果送回的时间
+            process = multiprocessing.Process(target=run_portfolio_config, daemon=True,
+                                              args=(name, kind, kwargs, initial_board, available_pieces, results))
+            process.start()
+            processes.append(process)
+
+        best = None  # (棋子数, 到达顺序, 名称, 解, 是否最优, 用时)
+        nodes = 0
+        finished = 0
+        try:
+            while finished < len(processes):
+                remaining = self.deadline - (time.time() - start_time)
+                if remaining <= 0:
+                    break
+                try:
+                    name, solution, optimal, config_nodes, error = results.get(timeout=remaining)
+                except queue.Empty:  # 期限已到
+                    break
+                finished += 1
+                nodes += config_nodes
+                elapsed = time.time() - start_time
+                if error is not None:
+                    print(f"组合求解：配置 {name} 出错：{error}")
+                    continue
+                if solution is None:
+                    if optimal:  # 已证明无解
+                        best = (0, finished, name, None, True, elapsed)
+                        break
+                    continue
+                print(f"组合求解：配置 {name} 在 {elapsed:.2f}秒 找到 {len(solution)} 个棋子的解"
+                      f"{'（已证明最优）' if optimal else ''}")
+                candidate = (len(solution), finished, name, solution, optimal, elapsed)
+                if best is None or candidate[:2] < best[:2]:
+                    best = candidate
+                elif optimal and len(solution) == best[0]:
+                    best = best[:4] + (True,) + best[5:]  # 先到的解与已证明最优的解一样少，同样是最优解
+                if optimal or self.first_result:
+                    break
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            for process in processes:
+                process.join()
+            results.close()
+
+        names = [name for name, _, _ in configs]
+        elapsed = time.time() - start_time
+        if best is None:
+            self.stats.record(names, None, elapsed)
+            print(f"组合求解在 {elapsed:.2f}秒 内未找到解")
+            return SolveResult(None, False, nodes, elapsed, "portfolio")
+        _, _, winner, solution, optimal, win_time = best
+        self.stats.record(names, winner, win_time)
+        print(f"组合求解由配置 {winner} 胜出，用时: {elapsed:.2f}秒")
+        return SolveResult(solution, optimal, nodes, elapsed, f"portfolio:{winner}")
+
+
+if __name__ == "__main__":
+    save_attack_tables()
+    print(f"攻击表已写入 {ATTACK_TABLES_PATH}（规则版本 {ATTACK_RULES_VERSION}）")
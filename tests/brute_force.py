@@ -0,0 +1,56 @@
+"""测试用的穷举求解：按棋子数逐层广度优先搜索真实的放置过程，得到最少棋子数"""
+import random
+
+import numpy as np
+
+from bomb_solver import PIECE_TYPES, BitboardState
+
+
+def brute_force_minimum(board, pieces, limit=8):
+    """最少需要的棋子数，无解时返回 None，超过 limit 仍未找到时返回 -1"""
+    frontier = [BitboardState(board, pieces)]
+    seen = set()
+    for depth in range(limit + 1):
+        next_frontier = []
+        for state in frontier:
+            if state.is_solved():
+                return depth
+            for _, piece_type, x, y in state.generate_moves():
+                child = state.place_piece(piece_type, x, y)
+                key = (tuple(child.layers), child.occupied, tuple(child.available_pieces.values()))
+                if key not in seen:
+                    seen.add(key)
+                    next_frontier.append(child)
+        if not next_frontier:
+            return None
+        frontier = next_frontier
+    return -1
+
+
+def blocking_board(rng, cells=(4, 9)):
+    """大部分格子已放置棋子、只剩少量骷髅和空格的小棋盘，容易出现循环阻挡"""
+    board = -np.ones((8, 8), dtype=int)
+    for index in rng.sample(range(64), rng.randint(*cells)):
+        board[index // 8, index % 8] = rng.choice((0, 0, 1, 1, 2, 3))
+    pieces = {piece_type: rng.randint(0, 3) for piece_type in PIECE_TYPES}
+    return board, pieces
+
+
+def blocking_cases(seed, count):
+    """生成 count 个有骷髅、且穷举能在限制内给出答案的 (棋盘, 棋子数量, 最少棋子数)"""
+    rng = random.Random(seed)
+    cases = []
+    while len(cases) < count:
+        board, pieces = blocking_board(rng)
+        if not (board > 0).any():
+            continue
+        minimum = brute_force_minimum(board, pieces)
+        if minimum != -1:
+            cases.append((board, pieces, minimum))
+    return cases
+
+
+def is_valid_solution(board, pieces, solution):
+    """按顺序模拟放置，检查解是否合法且消灭了所有骷髅"""
+    state = BitboardState(board, pieces)
+    return all(state.apply(piece_type, x, y) for piece_type, x, y in solution) and state.is_solved()
@@ -0,0 +1,49 @@
+import io
+import json
+import os
+
+import pytest
+
+import batch_solve
+from batch_solve import parse_board, read_lines, run_batch
+
+PUZZLE = "...3..../......../..1..2../......../....1.../.2....../......../.......1 Q1R2N3"
+
+
+def test_parse_board_accepts_the_documented_example():
+    board = parse_board(PUZZLE.split()[0])
+    assert board.shape == (8, 8) and board[0, 3] == 3 and board.sum() == 10
+
+
+@pytest.mark.parametrize("value", ["...9" + "." * 60, "." * 19, [[9] + [0] * 7] + [[0] * 8] * 7])
+def test_parse_board_rejects_bad_cells(value):
+    with pytest.raises(ValueError):
+        parse_board(value)
+
+
+def test_errors_report_file_and_line(tmp_path):
+    path = tmp_path / "puzzles.txt"
+    path.write_text(f"# comment\n{PUZZLE}\n\n{'4' * 64} Q1\n", encoding="utf-8")
+    output = io.StringIO()
+    run_batch(read_lines([str(path)]), mode="beam", time_limit=1.0, workers=1, output=output)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [record["status"] for record in records] == ["solved", "error"]
+    assert records[1]["error"].startswith(f"{path}:4:")
+
+
+def crash_on_second(index, *args):
+    """模拟工作进程崩溃：第二个谜题直接退出进程"""
+    if index == 1:
+        os._exit(1)
+    return {"index": index, "status": "solved", "elapsed": 0.0}
+
+
+def test_worker_crash_is_reported_and_batch_continues(monkeypatch):
+    monkeypatch.setattr(batch_solve, "solve_puzzle", crash_on_second)
+    output = io.StringIO()
+    stats = run_batch([PUZZLE] * 6, workers=1, output=output)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [record["index"] for record in records] == list(range(6))
+    assert records[1]["status"] == "error" and "BrokenProcessPool" in records[1]["error"]
+    assert records[-1]["status"] == "solved"
+    assert sum(stats.counts.values()) == 6
@@ -0,0 +1,42 @@
+import functools
+import multiprocessing
+
+import pytest
+
+from bomb_solver import decomposed_solution, exact_search_solution, interaction_components, solve_all
+from brute_force import brute_force_minimum, is_valid_solution
+from test_exact_solver import make_board
+
+# 两个独立分量的棋盘，其中一个分量曾被精确搜索误判为已证明无解，使整盘也被判为无解
+MULTI_COMPONENT = [
+    ({(0, 7): 0, (1, 7): 1, (3, 1): 1, (4, 0): 0, (4, 2): 1, (7, 5): 2}, {"P": 1, "R": 2, "Q": 3, "K": 2}, 4),
+    ({(2, 1): 0, (2, 4): 0, (3, 1): 1, (4, 6): 1, (4, 7): 2, (5, 5): 3, (5, 6): 1, (7, 3): 1},
+     {"P": 2, "N": 1, "B": 1, "R": 1, "Q": 1, "K": 2}, 5),
+]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+@pytest.mark.parametrize("cells, pieces, minimum", MULTI_COMPONENT)
+def test_decomposed_matches_brute_force(cells, pieces, minimum, max_workers):
+    board = make_board(cells)
+    assert len(interaction_components(board, pieces)) > 1
+    assert brute_force_minimum(board, pieces) == minimum
+
+    solver = functools.partial(exact_search_solution, seed_with_beam=False)
+    result = decomposed_solution(board, pieces, solver=solver, max_workers=max_workers)
+    assert result.solution is not None
+    assert is_valid_solution(board, pieces, result.solution)
+    assert len(result.solution) >= minimum
+    if result.optimal:
+        assert len(result.solution) == minimum
+
+
+def failing_solver(board, pieces):
+    raise RuntimeError("solver failed")
+
+
+def test_solve_all_shuts_down_workers_on_error():
+    board = make_board(MULTI_COMPONENT[0][0])
+    with pytest.raises(RuntimeError, match="solver failed"):
+        solve_all(failing_solver, [(board, {"Q": 1})] * 3, max_workers=2)
+    assert multiprocessing.active_children() == []
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from bomb_solver import ExactSolver, exact_search_solution
+from brute_force import blocking_cases, brute_force_minimum, is_valid_solution
+
+# 曾被误判为“已证明”的循环阻挡棋盘：(非 -1 的格子, 棋子数量, 最少棋子数)
+CYCLIC_BLOCKING = [
+    ({(0, 4): 1, (2, 1): 0, (7, 1): 1, (7, 2): 1, (7, 4): 1}, {"N": 1, "B": 2, "Q": 3}, 3),
+    ({(0, 4): 1, (0, 5): 2, (1, 1): 1, (2, 5): 1, (2, 7): 2, (4, 5): 3, (5, 1): 0, (6, 0): 1, (6, 5): 1},
+     {"B": 2, "R": 3, "Q": 3, "K": 3}, 5),
+    ({(0, 7): 2, (1, 1): 2, (1, 7): 1, (2, 7): 2, (3, 3): 0, (3, 6): 0, (4, 7): 2, (6, 1): 0},
+     {"N": 2, "B": 1, "R": 2, "Q": 2, "K": 3}, 4),
+]
+
+
+def make_board(cells):
+    board = -np.ones((8, 8), dtype=int)
+    for (x, y), value in cells.items():
+        board[x, y] = value
+    return board
+
+
+def check_against_minimum(result, board, pieces, minimum):
+    if minimum is None:
+        assert result.solution is None
+    else:
+        assert result.solution is not None, "有解的棋盘被判为无解"
+        assert is_valid_solution(board, pieces, result.solution)
+        assert len(result.solution) >= minimum
+        if result.optimal:
+            assert len(result.solution) == minimum
+
+
+@pytest.mark.parametrize("cells, pieces, minimum", CYCLIC_BLOCKING)
+def test_cyclic_blocking_cases(cells, pieces, minimum):
+    board = make_board(cells)
+    assert brute_force_minimum(board, pieces) == minimum
+    result = ExactSolver().solve(board, pieces)
+    assert result.optimal
+    check_against_minimum(result, board, pieces, minimum)
+
+
+@pytest.mark.parametrize("seed_with_beam", [False, True])
+def test_exact_matches_brute_force(seed_with_beam):
+    for board, pieces, minimum in blocking_cases(seed=5, count=150):
+        result = exact_search_solution(board, pieces, seed_with_beam=seed_with_beam, time_budget=30)
+        assert result.optimal
+        check_against_minimum(result, board, pieces, minimum)
@@ -0,0 +1,65 @@
+import random
+
+import numpy as np
+
+from bomb_solver import PIECE_TYPES, ChessState, DamageHeatmap
+
+
+def best_by_full_scan(board, pieces):
+    """逐格逐棋子计算的最大伤害 {格子: 伤害}，伤害为0的格子不列出"""
+    state = ChessState(board, pieces)
+    best = {}
+    for x in range(8):
+        for y in range(8):
+            damage = max(state.calculate_piece_efficiency(piece_type, x, y) for piece_type in PIECE_TYPES)
+            if damage > 0:
+                best[(x, y)] = damage
+    return best
+
+
+def heatmap_best(heatmap):
+    best = {}
+    for x in range(8):
+        for y in range(8):
+            move = heatmap.best_move(x, y)
+            if move is not None:
+                best[(x, y)] = move[1]
+    return best
+
+
+def test_incremental_updates_match_full_recompute():
+    rng = random.Random(0)
+    board = np.zeros((8, 8), dtype=int)
+    pieces = {piece_type: 1 for piece_type in PIECE_TYPES}
+    heatmap = DamageHeatmap(board, pieces)
+    for step in range(600):
+        before = (heatmap.best_piece.copy(), heatmap.best_damage.copy())
+        if step % 25 == 0:
+            pieces = {piece_type: rng.randint(0, 1) for piece_type in PIECE_TYPES}
+            changed = heatmap.set_pieces(pieces)
+        else:
+            x, y = rng.randrange(8), rng.randrange(8)
+            board[x, y] = rng.choice((0, 0, 1, 2, 3))
+            changed = heatmap.set_cell(x, y, board[x, y])
+
+        fresh = DamageHeatmap(board, pieces)
+        np.testing.assert_array_equal(heatmap.damage, fresh.damage)
+        np.testing.assert_array_equal(heatmap.best_piece, fresh.best_piece)
+        np.testing.assert_array_equal(heatmap.best_damage, fresh.best_damage)
+        # 返回的格子恰好是显示结果有变化的格子
+        moved = np.flatnonzero((before[0] != heatmap.best_piece) | (before[1] != heatmap.best_damage))
+        assert set(moved.tolist()) == set(np.asarray(changed).tolist())
+        if step % 50 == 0:
+            assert heatmap_best(heatmap) == best_by_full_scan(board, pieces)
+
+
+def test_ties_follow_top_moves():
+    rng = random.Random(1)
+    for _ in range(30):
+        board = np.zeros((8, 8), dtype=int)
+        for index in rng.sample(range(64), 20):
+            board[index // 8, index % 8] = rng.choice((1, 2, 3))
+        pieces = {piece_type: 1 for piece_type in PIECE_TYPES}
+        heatmap = DamageHeatmap(board, pieces)
+        efficiency, piece_type, x, y = ChessState(board, pieces).top_moves(1)[0]
+        assert heatmap.best_move(x, y) == (piece_type, efficiency)
@@ -0,0 +1,45 @@
+import pytest
+
+from bomb_solver import beam_search_solution, large_neighborhood_search
+from brute_force import blocking_cases, is_valid_solution
+from test_exact_solver import CYCLIC_BLOCKING, make_board
+
+# 大邻域搜索曾在这些棋盘上把多用了棋子的解标记为已证明最优
+FALSE_PROOFS = [
+    ({(0, 6): 3, (1, 5): 1, (4, 2): 1, (4, 4): 0, (5, 0): 0, (5, 1): 2, (5, 5): 1, (7, 1): 0, (7, 3): 1, (7, 5): 1,
+      (7, 7): 0}, {"P": 3, "N": 1, "R": 2, "Q": 3, "K": 3}, 4),
+    ({(0, 0): 1, (0, 6): 1, (1, 5): 0, (1, 7): 1, (2, 7): 0, (3, 1): 0, (3, 3): 3, (4, 2): 3, (6, 0): 2, (6, 2): 1,
+      (6, 3): 2, (7, 0): 0}, {"P": 1, "N": 1, "B": 1, "Q": 1, "K": 3}, 6),
+    ({(0, 5): 0, (1, 1): 0, (2, 4): 1, (4, 3): 1, (4, 6): 1, (5, 1): 1, (5, 7): 2, (6, 7): 0},
+     {"P": 1, "N": 3, "B": 1, "R": 2, "Q": 3, "K": 2}, 3),
+]
+
+
+def polish(board, pieces):
+    """从束搜索的解出发做大邻域搜索；束搜索找不到解时返回 None"""
+    solution = beam_search_solution(board, pieces, beam_width=10, max_depth=64, engine="bitboard")
+    if solution is None:
+        return None
+    return large_neighborhood_search(board, pieces, solution, time_budget=10.0, neighborhood=1, seed=0)
+
+
+def check_lns(board, pieces, minimum):
+    result = polish(board, pieces)
+    if result is None:
+        return False
+    assert minimum is not None
+    assert is_valid_solution(board, pieces, result.solution)
+    assert len(result.solution) >= minimum
+    if result.optimal:
+        assert len(result.solution) == minimum
+    return result.optimal
+
+
+@pytest.mark.parametrize("cells, pieces, minimum", CYCLIC_BLOCKING + FALSE_PROOFS)
+def test_lns_on_cyclic_blocking_cases(cells, pieces, minimum):
+    check_lns(make_board(cells), pieces, minimum)
+
+
+def test_lns_optimality_matches_brute_force():
+    proven = sum(check_lns(board, pieces, minimum) for board, pieces, minimum in blocking_cases(seed=7, count=80))
+    assert proven > 0
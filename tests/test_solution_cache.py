@@ -0,0 +1,80 @@
+import sqlite3
+
+import numpy as np
+
+from bomb_solver import (
+    CACHE_SOLVER_VERSION,
+    SolutionCache,
+    SolveResult,
+    canonical_key,
+    canonicalize_board,
+    orient_result,
+)
+
+BOARD = np.zeros((8, 8), dtype=int)
+BOARD[3, 3] = 2
+BOARD[6, 1] = 1
+PIECES = {"Q": 2, "R": 1}
+SOLUTION = [("Q", 3, 4), ("R", 6, 3)]
+
+
+def put(cache, board, result):
+    """按原棋盘的朝向写入结果"""
+    canonical, k = canonicalize_board(board)
+    return cache.store(canonical_key(canonical, PIECES), orient_result(result, k))
+
+
+def test_round_trip_across_orientations(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    put(SolutionCache(path), BOARD, SolveResult(SOLUTION, True))
+
+    reopened = SolutionCache(path)
+    result = reopened.get(BOARD, PIECES)
+    assert result.optimal and result.solution == SOLUTION
+    rotated = reopened.get(np.rot90(BOARD), PIECES)
+    assert rotated is not None and len(rotated.solution) == len(SOLUTION)
+
+
+def test_no_solution_never_replaces_a_solution(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SolutionCache(path)
+    put(cache, BOARD, SolveResult(SOLUTION, False))
+    kept = put(cache, BOARD, SolveResult(None, True))
+    assert kept.solution is not None
+
+    result = SolutionCache(path).get(BOARD, PIECES)
+    assert result.solution == SOLUTION and not result.optimal
+
+
+def test_solution_replaces_claimed_infeasibility(tmp_path):
+    cache = SolutionCache(str(tmp_path / "cache.sqlite3"))
+    put(cache, BOARD, SolveResult(None, True))
+    put(cache, BOARD, SolveResult(SOLUTION, False))
+    assert cache.get(BOARD, PIECES).solution == SOLUTION
+
+
+def test_entries_from_older_solvers_are_dropped(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    put(SolutionCache(path), BOARD, SolveResult(None, True))
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("UPDATE solutions SET solver_version = ?", (CACHE_SOLVER_VERSION - 1,))
+    conn.close()
+    assert SolutionCache(path).get(BOARD, PIECES) is None
+
+
+def test_cache_files_without_version_column_are_upgraded(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("CREATE TABLE solutions (key TEXT PRIMARY KEY, solution TEXT, piece_count INTEGER, "
+                     "optimal INTEGER NOT NULL, mode TEXT, created REAL NOT NULL, last_used REAL NOT NULL)")
+        conn.execute("INSERT INTO solutions VALUES ('stale', NULL, NULL, 1, 'exact', 0, 0)")
+    conn.close()
+
+    cache = SolutionCache(path)
+    put(cache, BOARD, SolveResult(SOLUTION, True))
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT key, solver_version FROM solutions").fetchall()
+    conn.close()
+    assert len(rows) == 1 and rows[0][1] == CACHE_SOLVER_VERSION
@@ -0,0 +1,91 @@
+import random
+
+import numpy as np
+import pytest
+
+from bomb_solver import PIECE_TYPES, BitboardState, ChessState, CompactState, pack_state, unpack_state, zobrist_hash
+
+ENGINES = [ChessState, BitboardState, CompactState]
+
+
+def random_position(rng):
+    board = np.zeros((8, 8), dtype=int)
+    for index in rng.sample(range(64), rng.randint(5, 40)):
+        board[index // 8, index % 8] = rng.choice((1, 1, 2, 3, -1))
+    pieces = {piece_type: rng.randint(0, 6) for piece_type in PIECE_TYPES}
+    return board, pieces
+
+
+def snapshot(state):
+    return (state.board_vector().tolist(), int(state.remaining_health()), bool(state.is_solved()), state.zobrist,
+            state.available_pieces, list(state.bombs_used), sorted(state.generate_moves()))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_engines_agree_move_for_move(seed):
+    rng = random.Random(seed)
+    for _ in range(40):
+        board, pieces = random_position(rng)
+        original = board.copy()
+        states = [engine(board, pieces) for engine in ENGINES]
+        for _ in range(12):
+            snapshots = [snapshot(state) for state in states]
+            assert snapshots[0] == snapshots[1] == snapshots[2]
+            assert snapshots[0][3] == zobrist_hash(states[1].board, states[1].available_pieces)
+            moves = snapshots[0][-1]
+            if not moves:
+                break
+            _, piece_type, x, y = rng.choice(moves)
+            states = [state.place_piece(piece_type, x, y) for state in states]
+        np.testing.assert_array_equal(board, original)  # 引擎不修改调用者的棋盘
+
+
+def test_top_moves_agree():
+    rng = random.Random(11)
+    for _ in range(50):
+        board, pieces = random_position(rng)
+        results = [engine(board, pieces).top_moves(5) for engine in ENGINES]
+        assert results[0] == results[1] == results[2]
+
+
+def test_place_piece_leaves_parent_unchanged():
+    board, pieces = random_position(random.Random(3))
+    for engine in ENGINES:
+        state = engine(board, pieces)
+        before = snapshot(state)
+        _, piece_type, x, y = max(state.generate_moves())
+        state.place_piece(piece_type, x, y)
+        assert snapshot(state) == before
+
+
+def test_bitboard_apply_undo_round_trip():
+    rng = random.Random(7)
+    for _ in range(40):
+        board, pieces = random_position(rng)
+        state = BitboardState(board, pieces)
+        history = [snapshot(state)]
+        reference = state
+        while True:
+            moves = state.generate_moves()
+            if not moves:
+                break
+            _, piece_type, x, y = rng.choice(moves)
+            reference = reference.place_piece(piece_type, x, y)
+            assert state.apply(piece_type, x, y)
+            assert snapshot(state) == snapshot(reference)
+            history.append(snapshot(state))
+        while state.bombs_used:
+            history.pop()
+            state.undo()
+            assert snapshot(state) == history[-1]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_pack_round_trip(engine):
+    board, pieces = random_position(random.Random(5))
+    state = engine(board, pieces)
+    for _, piece_type, x, y in sorted(state.generate_moves(), reverse=True)[:3]:
+        child = state.place_piece(piece_type, x, y)
+        if child is not None:
+            state = child
+    assert snapshot(unpack_state(engine, pack_state(state))) == snapshot(state)